@@ -5,12 +5,14 @@ from flask_swagger_ui import get_swaggerui_blueprint
 from dotenv import load_dotenv
 from .db import init_app as init_db
 from .security import add_security_headers
+from .compression import compress_response
 
 # Load environment variables from .env file
 load_dotenv()
 
-def create_app(test_config=None):
-    # Create and configure the app
+def create_app(test_config=None, background_tasks=True):
+    # Create and configure the app. background_tasks=False (CLI scripts) skips
+    # the per-worker threads: session sweeper and invalidation listener.
     app = Flask(__name__, instance_relative_config=True)
     
     # Validate required environment variables
@@ -78,10 +80,14 @@ def create_app(test_config=None):
     # Add security headers to all responses
     app.after_request(add_security_headers)
     
+    # Compress JSON/text bodies (gzip, or brotli when installed)
+    app.after_request(compress_response)
+    
+    app.config['BACKGROUND_TASKS'] = background_tasks
     init_db(app)
 
     # Register Blueprints
-    from .routes import cars, ai, system, auth, dealers, favorites, listings, reviews, watchlist
+    from .routes import cars, ai, system, auth, dealers, favorites, listings, reviews, watchlist, exports, batch
     app.register_blueprint(cars.bp)
     app.register_blueprint(ai.bp)
     app.register_blueprint(system.bp)
@@ -91,6 +97,8 @@ def create_app(test_config=None):
     app.register_blueprint(listings.bp)
     app.register_blueprint(reviews.bp)
     app.register_blueprint(watchlist.bp)
+    app.register_blueprint(exports.bp)
+    app.register_blueprint(batch.bp)
     
     # Setup Swagger UI
     SWAGGER_URL = '/api/docs'
@@ -109,5 +117,12 @@ def create_app(test_config=None):
 
     return app
 
-# Expose app instance for 'gunicorn app:app'
-app = create_app()
+def __getattr__(name):
+    # Expose app instance for 'gunicorn app:app' and `from app import app`. Built
+    # on first access, so importing create_app (run.py, CLI scripts) or any
+    # submodule doesn't construct a second app.
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
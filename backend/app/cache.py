@@ -0,0 +1,313 @@
+"""
+In-process cache primitives shared by the routes and services.
+Each gunicorn worker holds its own copy; keep TTLs short for anything
+another worker can change. SharedSingleFlight is the exception: it coalesces
+work across the workers of one host through a SQLite file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded LRU cache with a per-entry time to live. Thread-safe."""
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Evict every entry whose (key, value) matches predicate. Returns the count evicted."""
+        with self._lock:
+            doomed = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller computes,
+    callers arriving while it runs wait up to `timeout` seconds and share its
+    result (or its exception). A waiter that times out computes on its own
+    rather than fail. Only coalesces within one process (threaded workers).
+    """
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self, key):
+        return key in self._flights
+
+    def do(self, key, compute):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                return compute()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+
+class SharedSingleFlight:
+    """
+    SingleFlight across the processes of one host. Sync gunicorn workers serve
+    one request at a time, so an in-process SingleFlight never sees two callers;
+    here the first caller anywhere on the host takes a lease row in a SQLite
+    file, computes, and stores the result, while callers in other workers poll
+    for it (threads of one worker first coalesce in-process).
+
+    Results are stored as plain data, never pickled: `encode(value)` returns
+    (meta, body) with meta JSON-serializable and body bytes, and
+    `decode(meta, body)` rebuilds the value. `path` may be a callable, resolved
+    on first use in each process; the file is created owner-only (0600).
+    Results stay readable for `result_ttl` seconds, so keys must identify the
+    value exactly (e.g. include a version). A waiter computes on its own when
+    the lease holder fails, the result is larger than `max_result_bytes`, the
+    timeout passes or the file can't be used.
+    """
+
+    def __init__(self, path, encode, decode, timeout=10.0, poll_interval=0.05, result_ttl=30,
+                 max_result_bytes=2 * 1024 * 1024, prune_every=500):
+        self.path = path
+        self.encode = encode
+        self.decode = decode
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.max_result_bytes = max_result_bytes
+        self.prune_every = prune_every
+        self._local_flight = SingleFlight(timeout=timeout)
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (gunicorn workers)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            path = self.path() if callable(self.path) else self.path
+            # Owner-only before SQLite opens it; the -wal/-shm files inherit the mode
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+            os.chmod(path, 0o600)
+            conn = sqlite3.connect(path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS single_flights ('
+                'key TEXT PRIMARY KEY, owner TEXT NOT NULL, lease_until REAL NOT NULL, '
+                'meta TEXT, body BLOB, done_at REAL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def in_flight(self, key):
+        return self._local_flight.in_flight(key)
+
+    def do(self, key, compute):
+        return self._local_flight.do(key, lambda: self._do_shared(repr(key), compute))
+
+    def _claim(self, conn, key, owner, now):
+        """(leader, result) for key: a finished (meta, body) row, or whether this caller now holds the lease."""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT lease_until, meta, body, done_at FROM single_flights WHERE key = ?', (key,)
+            ).fetchone()
+            if row and row[1] is not None and row[3] > now - self.result_ttl:
+                conn.execute('COMMIT')
+                return False, row[1:3]
+            leader = row is None or row[1] is not None or row[0] < now
+            if leader:
+                conn.execute(
+                    'INSERT OR REPLACE INTO single_flights (key, owner, lease_until) VALUES (?, ?, ?)',
+                    (key, owner, now + self.timeout)
+                )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                conn.execute('DELETE FROM single_flights WHERE lease_until < ? AND (done_at IS NULL OR done_at < ?)',
+                             (now, now - self.result_ttl))
+            conn.execute('COMMIT')
+            return leader, None
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _do_shared(self, key, compute):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        try:
+            conn = self._connect()
+            leader, result = self._claim(conn, key, owner, time.time())
+        except (sqlite3.Error, OSError) as e:
+            print(f"[Cache] Shared single-flight unavailable, computing locally: {e}")
+            return compute()
+        if result is not None:
+            return self._load(*result)
+
+        if leader:
+            try:
+                value = compute()
+            except BaseException:
+                self._release(conn, key, owner)
+                raise
+            meta, body = self.encode(value)
+            try:
+                if len(body) > self.max_result_bytes:
+                    self._release(conn, key, owner)
+                else:
+                    conn.execute(
+                        'UPDATE single_flights SET meta = ?, body = ?, done_at = ? WHERE key = ? AND owner = ?',
+                        (json.dumps(meta), sqlite3.Binary(body), time.time(), key, owner)
+                    )
+            except sqlite3.Error as e:
+                print(f"[Cache] Could not share single-flight result: {e}")
+            return value
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            try:
+                row = conn.execute('SELECT meta, body FROM single_flights WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                break
+            if row is None:
+                break  # The leader failed or its result was too large to share
+            if row[0] is not None:
+                return self._load(*row)
+        return compute()
+
+    def _load(self, meta, body):
+        return self.decode(json.loads(meta), bytes(body))
+
+    def _release(self, conn, key, owner):
+        try:
+            conn.execute('DELETE FROM single_flights WHERE key = ? AND owner = ?', (key, owner))
+        except sqlite3.Error:
+            pass
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache of versioned values (e.g. responses keyed by URL, versioned by the
+    catalog version they were computed from).
+
+    get(key, version, compute) returns (value, fresh):
+      - an entry computed for `version` is fresh
+      - an entry for an older version, computed less than `stale_ttl` seconds
+        ago, is returned stale while one background refresh recomputes it
+      - anything else is computed now, single-flighted per (key, version)
+        through `flight` (a SingleFlight or SharedSingleFlight)
+    `background(fn)` runs fn off the request path (default: a daemon thread);
+    values rejected by `cacheable(value)` are returned but not stored.
+    """
+
+    def __init__(self, max_size=256, ttl=300, stale_ttl=30, flight=None,
+                 cacheable=None, background=None):
+        self.stale_ttl = stale_ttl
+        self._entries = TTLCache(max_size=max_size, ttl=ttl)  # key -> (version, value, computed_at)
+        self._flight = flight or SingleFlight()
+        self._cacheable = cacheable or (lambda value: True)
+        self._background = background or self._in_thread
+
+    @staticmethod
+    def _in_thread(fn):
+        threading.Thread(target=fn, daemon=True).start()
+
+    def _fill(self, key, version, compute):
+        value = compute()
+        if self._cacheable(value):
+            self._entries.set(key, (version, value, time.monotonic()))
+        return value
+
+    def _refresh(self, key, version, compute):
+        try:
+            self._flight.do((key, version), lambda: self._fill(key, version, compute))
+        except Exception as e:
+            # The stale entry stays until its TTL; the next request retries
+            print(f"[Cache] Background refresh of {key!r} failed: {e}")
+
+    def get(self, key, version, compute):
+        entry = self._entries.get(key)
+        if entry is not None:
+            cached_version, value, computed_at = entry
+            if cached_version == version:
+                return value, True
+            if time.monotonic() - computed_at < self.stale_ttl:
+                if not self._flight.in_flight((key, version)):
+                    self._background(lambda: self._refresh(key, version, compute))
+                return value, False
+        return self._flight.do((key, version), lambda: self._fill(key, version, compute)), True
+
+    def delete_where(self, predicate):
+        return self._entries.delete_where(predicate)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
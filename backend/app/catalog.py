@@ -0,0 +1,88 @@
+"""
+Catalog versions: a per-entity counter bumped in the same transaction as every
+write to cars or dealers. Readers learn whether anything changed from one tiny
+table instead of scanning the catalog (used for ETags and cache keys).
+"""
+
+from datetime import datetime, timezone
+
+from flask import g, has_app_context
+
+from .services import invalidation
+
+CARS = 'cars'
+DEALERS = 'dealers'
+CATALOG_ENTITIES = (CARS, DEALERS)
+
+# Listing query arguments that never change which cars match
+NON_FILTER_ARGS = frozenset({'limit', 'offset', 'fields', 'stream', 'facets', 'sort', 'count'})
+
+
+def bump_catalog_version(db, *entities, ids=()):
+    """
+    Increment the version of each entity and publish an invalidation event per
+    written id (or one id-less event) to the other workers. The caller commits.
+    """
+    for entity in entities:
+        version = db.execute('''
+            INSERT INTO catalog_versions (entity, version, updated_at)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (entity) DO UPDATE
+            SET version = catalog_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+            RETURNING version
+        ''', (entity,)).fetchone()['version']
+        for entity_id in ids or (None,):
+            invalidation.publish(db, entity, entity_id, version)
+    if has_app_context():
+        g.pop('catalog_versions', None)
+
+
+def bump_after_import(connection, *entities):
+    """
+    Bump catalog versions from an import script's own sqlite3/psycopg2
+    connection (no app or request). Data loaded outside the app must never
+    match an ETag or cache entry issued before the load. Commits.
+    """
+    cursor = connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            entity TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for entity in entities or CATALOG_ENTITIES:
+        # Entities are module constants; inlined because the two drivers use different placeholders
+        cursor.execute(f'''
+            INSERT INTO catalog_versions (entity, version, updated_at)
+            VALUES ('{entity}', 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (entity) DO UPDATE
+            SET version = catalog_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+        ''')
+    connection.commit()
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def get_catalog_versions(db):
+    """Return {entity: (version, updated_at)} for this request (read once, memoized on g)."""
+    if 'catalog_versions' not in g:
+        rows = db.execute('SELECT entity, version, updated_at FROM catalog_versions').fetchall()
+        g.catalog_versions = {row['entity']: (row['version'], _as_utc(row['updated_at'])) for row in rows}
+    return g.catalog_versions
+
+
+def filter_signature(args):
+    """Hashable, order-independent form of a listing request's filter arguments (for cache keys)."""
+    return tuple(sorted(
+        (key, value) for key, value in args.items(multi=True) if key not in NON_FILTER_ARGS and value
+    ))
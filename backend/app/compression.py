@@ -0,0 +1,82 @@
+"""
+Response compression (brotli when available, otherwise gzip).
+
+JSON and text bodies above COMPRESS_MIN_SIZE are compressed for clients that
+accept it. Bodies of responses carrying an ETag (the conditional catalog reads)
+are compressed once and reused from a bounded cache keyed by (ETag, encoding).
+"""
+
+import gzip
+import os
+
+from flask import request
+
+from .cache import TTLCache
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Larger bodies are still compressed, just not kept around
+COMPRESS_CACHE_MAX_BODY = 2 * 1024 * 1024
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+SUPPORTED_ENCODINGS = ('br', 'gzip') if HAS_BROTLI else ('gzip',)
+
+_compressed_bodies = TTLCache(
+    max_size=int(os.environ.get('COMPRESS_CACHE_SIZE', 128)),
+    ttl=int(os.environ.get('COMPRESS_CACHE_TTL', 600))
+)
+
+
+def representation_etag(etag, encoding):
+    """Strong ETag of the `encoding` variant of a response (RFC 9110 8.8.3)."""
+    return f"{etag}-{encoding}"
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook: negotiate Content-Encoding and compress eligible bodies."""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not _is_compressible(response)):
+        return response
+
+    # The body differs by Accept-Encoding whether or not this client gets it compressed
+    response.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(SUPPORTED_ENCODINGS)
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    etag, weak = response.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    body = _compressed_bodies.get(key) if key else None
+    if body is None:
+        body = _compress(data, encoding)
+        if key and len(body) <= COMPRESS_CACHE_MAX_BODY:
+            _compressed_bodies.set(key, body)
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(representation_etag(etag, encoding), weak=weak)
+    return response
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import uuid
 from flask import g, current_app
 
 # PostgreSQL support
@@ -16,12 +17,13 @@ def is_postgres():
 
 class PostgresRowWrapper:
     """Wrapper to make psycopg2 rows behave like sqlite3.Row."""
-    def __init__(self, cursor, row):
-        self._data = dict(zip([desc[0] for desc in cursor.description], row))
+    def __init__(self, cursor, row, columns=None):
+        self._values = row
+        self._data = dict(zip(columns or [desc[0] for desc in cursor.description], row))
     
     def __getitem__(self, key):
         if isinstance(key, int):
-            return list(self._data.values())[key]
+            return self._values[key]
         return self._data[key]
     
     def keys(self):
@@ -74,6 +76,10 @@ class PostgresCursorWrapper:
         
         return self
     
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+    
     def _convert_json_extract(self, sql):
         """Convert SQLite json_extract to PostgreSQL JSON operators."""
         import re
@@ -91,8 +97,19 @@ class PostgresCursorWrapper:
     def fetchall(self):
         rows = self._cursor.fetchall()
         if rows and self._cursor.description:
-            return [PostgresRowWrapper(self._cursor, row) for row in rows]
+            columns = [desc[0] for desc in self._cursor.description]
+            return [PostgresRowWrapper(self._cursor, row, columns) for row in rows]
+        return rows
+    
+    def fetchmany(self, size):
+        rows = self._cursor.fetchmany(size)
+        if rows and self._cursor.description:
+            columns = [desc[0] for desc in self._cursor.description]
+            return [PostgresRowWrapper(self._cursor, row, columns) for row in rows]
         return rows
+    
+    def close(self):
+        self._cursor.close()
 
 class PostgresConnectionWrapper:
     """Wrapper to make psycopg2 connection behave like sqlite3 connection."""
@@ -123,6 +140,54 @@ class PostgresConnectionWrapper:
     def row_factory(self, value):
         pass  # PostgreSQL handles this differently
 
+# Indexes shared by both backends (plain CREATE INDEX syntax works on SQLite and PostgreSQL)
+INDEXES = [
+    # Per-user session listing/capping at login, and the expiry sweeper
+    "CREATE INDEX IF NOT EXISTS idx_user_sessions_user_created ON user_sessions(user_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_user_sessions_expires_at ON user_sessions(expires_at)",
+    # Listing sorts (GET /api/cars ?sort=, see routes/cars.py SORT_ORDERS), also
+    # serving the matching range filters when no equality filter applies
+    "CREATE INDEX IF NOT EXISTS idx_cars_created_id ON cars(created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_price_id ON cars(price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_year_id ON cars(year, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_rating_id ON cars(rating, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_odometer ON cars(odometer_km)",
+    # Equality filter + range/sort on the same index (make or city, then price/year/recency)
+    "CREATE INDEX IF NOT EXISTS idx_cars_make_price ON cars(make, price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_make_year ON cars(make, year, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_make_created ON cars(make, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_city_price ON cars(city, price, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_city_created ON cars(city, created_at, id)",
+]
+
+# Hot specs/engines JSON fields promoted to generated columns, so filters and
+# the taxonomy read (and index) a plain column instead of parsing JSON per row.
+# Computed by the database on every write, including the import scripts' rows.
+SQLITE_SPEC_COLUMNS = [
+    "body_style TEXT GENERATED ALWAYS AS ("
+    "CASE WHEN json_valid(specs) THEN LOWER(TRIM(json_extract(specs, '$.bodyStyle'))) END) VIRTUAL",
+    "horsepower INTEGER GENERATED ALWAYS AS (COALESCE("
+    "CASE WHEN json_valid(specs) THEN NULLIF(CAST(json_extract(specs, '$.horsepower') AS INTEGER), 0) END, "
+    "CASE WHEN json_valid(engines) THEN NULLIF(CAST(json_extract(engines, '$[0].powerHp') AS INTEGER), 0) END)) VIRTUAL",
+    "engine TEXT GENERATED ALWAYS AS (COALESCE("
+    "CASE WHEN json_valid(specs) THEN json_extract(specs, '$.engine') END, "
+    "CASE WHEN json_valid(engines) THEN json_extract(engines, '$[0].engine') END)) VIRTUAL",
+]
+
+POSTGRES_SPEC_COLUMNS = [
+    "body_style TEXT GENERATED ALWAYS AS (LOWER(TRIM(specs->>'bodyStyle'))) STORED",
+    "horsepower INTEGER GENERATED ALWAYS AS (COALESCE("
+    "SUBSTRING(specs->>'horsepower' FROM '^\\s*(\\d{1,6})')::INTEGER, "
+    "SUBSTRING(engines->0->>'powerHp' FROM '^\\s*(\\d{1,6})')::INTEGER)) STORED",
+    "engine TEXT GENERATED ALWAYS AS (COALESCE(specs->>'engine', engines->0->>'engine')) STORED",
+]
+
+SPEC_COLUMN_INDEXES = [
+    # "SUVs over 300hp": equality on body style, range on horsepower
+    "CREATE INDEX IF NOT EXISTS idx_cars_body_hp ON cars(body_style, horsepower, id)",
+    "CREATE INDEX IF NOT EXISTS idx_cars_horsepower ON cars(horsepower, id)",
+]
+
 def get_db():
     if 'db' not in g:
         if is_postgres() and HAS_POSTGRES:
@@ -140,6 +205,27 @@ def get_db():
             print(f"[DB] Connected to SQLite: {db_path}")
     return g.db
 
+def iter_row_batches(db, sql, params=(), batch_size=200):
+    """
+    Yield a query's rows in lists of up to batch_size without loading the whole
+    result. PostgreSQL uses a named (server-side) cursor so rows stay on the server.
+    """
+    if isinstance(db, PostgresConnectionWrapper):
+        raw_cursor = db._connection.cursor(name=f"iter_{uuid.uuid4().hex}")
+        raw_cursor.itersize = batch_size
+        cursor = PostgresCursorWrapper(raw_cursor, db._connection)
+    else:
+        cursor = db.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
@@ -153,6 +239,23 @@ def init_db(app):
             _init_postgres_tables(db)
         else:
             _init_sqlite_tables(db)
+        
+        # Rows inserted by the import scripts have no search text yet
+        from .services.text_normalization import refresh_search_text
+        backfilled = refresh_search_text(db)
+        if backfilled:
+            print(f"[DB] Backfilled search text for {backfilled} cars")
+        
+        # Versions start at 1 so catalog reads get ETags before the first write.
+        # Never bumped here: starting a worker or a CLI changes no data (the import
+        # scripts bump after loading, see catalog.bump_after_import).
+        from .catalog import CATALOG_ENTITIES
+        for entity in CATALOG_ENTITIES:
+            db.execute(
+                'INSERT INTO catalog_versions (entity, version) VALUES (?, 1) ON CONFLICT (entity) DO NOTHING',
+                (entity,)
+            )
+        db.commit()
 
 def _init_postgres_tables(db):
     """Initialize PostgreSQL tables."""
@@ -180,6 +283,23 @@ def _init_postgres_tables(db):
         )
     ''')
     
+    # Revoked signed access tokens (AUTH_TOKEN_MODE=signed), kept until they expire
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti TEXT PRIMARY KEY,
+            expires_at TIMESTAMP NOT NULL
+        )
+    ''')
+    
+    # Per-entity catalog version, bumped on every catalog write (see app/catalog.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            entity TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
     # Create Cars Table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS cars (
@@ -279,6 +399,9 @@ def _init_postgres_tables(db):
         "ALTER TABLE cars ADD COLUMN IF NOT EXISTS city TEXT",
         "ALTER TABLE cars ADD COLUMN IF NOT EXISTS neighborhood TEXT",
         "ALTER TABLE cars ADD COLUMN IF NOT EXISTS trim TEXT",
+        "ALTER TABLE cars ADD COLUMN IF NOT EXISTS card_json TEXT",
+        "ALTER TABLE cars ADD COLUMN IF NOT EXISTS card_version INTEGER",
+        "ALTER TABLE cars ADD COLUMN IF NOT EXISTS search_text TEXT",
         "ALTER TABLE dealers ADD COLUMN IF NOT EXISTS user_id INTEGER",
         "ALTER TABLE dealers ADD COLUMN IF NOT EXISTS latitude REAL",
         "ALTER TABLE dealers ADD COLUMN IF NOT EXISTS longitude REAL",
@@ -293,6 +416,29 @@ def _init_postgres_tables(db):
         except Exception as e:
             print(f"[DB] Migration note: {e}")
     
+    for index in INDEXES:
+        try:
+            cursor.execute(index)
+        except Exception as e:
+            print(f"[DB] Index note: {e}")
+    
+    # Generated columns require PostgreSQL 12+. Listing filters, the taxonomy and
+    # semantic search read them unconditionally, so failing here is deliberate.
+    for column in POSTGRES_SPEC_COLUMNS:
+        cursor.execute(f"ALTER TABLE cars ADD COLUMN IF NOT EXISTS {column}")
+    for index in SPEC_COLUMN_INDEXES:
+        cursor.execute(index)
+    
+    # Trigram index so search_text LIKE '%term%' doesn't scan (needs the pg_trgm extension)
+    try:
+        cursor.execute("SAVEPOINT search_text_index")
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_cars_search_text_trgm ON cars USING gin (search_text gin_trgm_ops)")
+        cursor.execute("RELEASE SAVEPOINT search_text_index")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT search_text_index")
+        print(f"[DB] Search index note: {e}")
+    
     db._connection.commit()
     print("[DB] PostgreSQL tables initialized")
 
@@ -326,6 +472,35 @@ def _init_sqlite_tables(db):
         )
     ''')
     
+    # Revoked signed access tokens (AUTH_TOKEN_MODE=signed), kept until they expire
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti TEXT PRIMARY KEY,
+            expires_at TIMESTAMP NOT NULL
+        )
+    ''')
+    
+    # Per-entity catalog version, bumped on every catalog write (see app/catalog.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            entity TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Cross-worker invalidation events, polled by each worker (see app/services/invalidation.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS invalidation_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id TEXT,
+            version INTEGER,
+            origin TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
     # Create Cars Table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS cars (
@@ -416,12 +591,41 @@ def _init_sqlite_tables(db):
         )
     ''')
     
-    # Migration: Add odometer_km column if it doesn't exist (SQLite doesn't support IF NOT EXISTS for ALTER)
-    try:
-        cursor.execute("ALTER TABLE cars ADD COLUMN odometer_km INTEGER")
-    except Exception as e:
-        # Column likely already exists
-        pass
+    # Migration: columns missing from older databases and the ones built by
+    # import_sql_data.py (SQLite doesn't support IF NOT EXISTS for ALTER; the
+    # error for an existing column is ignored). Listing filters, sorts and
+    # indexes read all of these.
+    for column in (
+        "owner_id INTEGER", "odometer_km INTEGER", "engines JSON", "statistics JSON", "source_sheets JSON",
+        "category TEXT DEFAULT 'car'", "condition TEXT DEFAULT 'used'", "exterior_color TEXT",
+        "interior_color TEXT", "transmission TEXT", "fuel_type TEXT", "regional_spec TEXT",
+        "payment_type TEXT DEFAULT 'cash'", "city TEXT", "neighborhood TEXT", "trim TEXT",
+    ):
+        try:
+            cursor.execute(f"ALTER TABLE cars ADD COLUMN {column}")
+        except Exception:
+            pass
+    
+    # Migration: pre-rendered listing card JSON (see app/serializers.py) and
+    # normalized search text (see app/services/text_normalization.py)
+    for column in ("card_json TEXT", "card_version INTEGER", "search_text TEXT"):
+        try:
+            cursor.execute(f"ALTER TABLE cars ADD COLUMN {column}")
+        except Exception:
+            pass
+    
+    # Migration: generated spec columns (ALTER TABLE can only add VIRTUAL ones)
+    for column in SQLITE_SPEC_COLUMNS:
+        try:
+            cursor.execute(f"ALTER TABLE cars ADD COLUMN {column}")
+        except Exception:
+            pass
+    
+    for index in INDEXES + SPEC_COLUMN_INDEXES:
+        try:
+            cursor.execute(index)
+        except Exception as e:
+            print(f"[DB] Index note: {e}")
     
     db.commit()
     print("[DB] SQLite tables initialized")
@@ -429,3 +633,11 @@ def _init_sqlite_tables(db):
 def init_app(app):
     app.teardown_appcontext(close_db)
     init_db(app)
+    if not app.config.get('BACKGROUND_TASKS', True):
+        return
+    
+    from .services.session_sweeper import start_session_sweeper
+    start_session_sweeper(app)
+    
+    from .services.invalidation import start_invalidation_listener
+    start_invalidation_listener(app)
@@ -0,0 +1,195 @@
+"""
+HTTP conditional GET support for catalog reads.
+
+Responses get a strong ETag derived from the catalog versions they depend on
+plus the path and query string, a Last-Modified from the newest version bump,
+and a Cache-Control policy. Matching If-None-Match / If-Modified-Since requests
+are answered with 304 before the view runs, so no catalog query is made.
+
+Expensive views can also be @coalesced: identical concurrent requests share one
+computation of the response (across all workers of the host, through a SQLite
+file in the instance folder; only within each worker with
+SINGLE_FLIGHT_BACKEND=memory),
+and a response whose catalog version has moved on is served stale for a few
+seconds while one background request rebuilds it.
+"""
+
+import hashlib
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, request, make_response, copy_current_request_context
+
+from .cache import StaleWhileRevalidateCache, SingleFlight, SharedSingleFlight
+from .catalog import get_catalog_versions
+from .compression import SUPPORTED_ENCODINGS, representation_etag
+from .db import get_db
+from .serializers import wants_ndjson
+
+
+def catalog_etag(entities):
+    """Return (etag, last_modified) for the current request, or (None, None) if unversioned."""
+    versions = get_catalog_versions(get_db())
+    if any(entity not in versions for entity in entities):
+        return None, None
+    parts = [request.path]
+    parts.extend(f"{entity}:{versions[entity][0]}" for entity in entities)
+    parts.extend(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    if wants_ndjson():
+        parts.append('ndjson')
+    etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+    modified = [versions[entity][1] for entity in entities if versions[entity][1]]
+    return etag, max(modified) if modified else None
+
+
+def _matching_etag(etag):
+    """The ETag the client already holds for this resource (any encoding variant), if any."""
+    for candidate in (etag,) + tuple(representation_etag(etag, encoding) for encoding in SUPPORTED_ENCODINGS):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def _set_validators(response, etag, last_modified, cache_control, vary):
+    response.set_etag(etag)
+    for header in vary:
+        response.vary.add(header)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def conditional(*entities, max_age=0, vary=()):
+    """
+    Decorator for GET views whose body depends only on the given catalog entities
+    and the request URL (never on the caller's identity). `vary` lists request
+    headers the view also negotiates on, e.g. Accept.
+    """
+    cache_control = f'public, max-age={max_age}, must-revalidate'
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            etag, last_modified = catalog_etag(entities)
+            if etag is None:
+                return f(*args, **kwargs)
+
+            # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110)
+            if request.if_none_match:
+                held = _matching_etag(etag)
+            else:
+                since = request.if_modified_since
+                held = etag if since and last_modified and last_modified <= since else None
+            if held:
+                return _set_validators(make_response('', 304), held, last_modified, cache_control, vary)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                if 'ETag' in response.headers:
+                    # A stale @coalesced response already carries its own version's validators
+                    response.vary.update(vary)
+                else:
+                    _set_validators(response, etag, last_modified, cache_control, vary)
+            return response
+        return decorated_function
+    return decorator
+
+
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_STALE_SECONDS = int(os.environ.get('RESPONSE_STALE_SECONDS', 30))
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 10))
+# sqlite: coalesce across the workers of the host; memory: within each worker
+SINGLE_FLIGHT_BACKEND = os.environ.get('SINGLE_FLIGHT_BACKEND', 'sqlite').lower()
+# Larger bodies are still shared between concurrent requests, just not kept
+RESPONSE_CACHE_MAX_BODY = 512 * 1024
+
+_Snapshot = namedtuple('_Snapshot', 'status headers body etag last_modified')
+
+
+def _snapshot(response, etag, last_modified):
+    """Immutable copy of a view response; each request gets its own Response built from it."""
+    headers = [(name, value) for name, value in response.headers.items() if name != 'Content-Length']
+    return _Snapshot(response.status_code, headers, response.get_data(), etag, last_modified)
+
+
+def _encode_snapshot(snapshot):
+    """Plain-data form of a snapshot for the shared single-flight file: (JSON meta, body bytes)."""
+    last_modified = snapshot.last_modified.timestamp() if snapshot.last_modified else None
+    return {'status': snapshot.status, 'headers': snapshot.headers, 'etag': snapshot.etag,
+            'last_modified': last_modified}, snapshot.body
+
+
+def _decode_snapshot(meta, body):
+    last_modified = meta['last_modified']
+    return _Snapshot(
+        meta['status'], [tuple(header) for header in meta['headers']], body, meta['etag'],
+        datetime.fromtimestamp(last_modified, timezone.utc) if last_modified is not None else None
+    )
+
+
+def _single_flight_path():
+    return os.environ.get('SINGLE_FLIGHT_DB_PATH') or os.path.join(current_app.instance_path, 'single_flight.db')
+
+
+def _response_flight():
+    if SINGLE_FLIGHT_BACKEND == 'sqlite':
+        return SharedSingleFlight(_single_flight_path, _encode_snapshot, _decode_snapshot,
+                                  timeout=SINGLE_FLIGHT_TIMEOUT)
+    return SingleFlight(timeout=SINGLE_FLIGHT_TIMEOUT)
+
+
+def _cacheable(snapshot):
+    return snapshot.status < 500 and len(snapshot.body) <= RESPONSE_CACHE_MAX_BODY
+
+
+def _in_request_thread(fn):
+    """Run fn in a daemon thread with a copy of the current request (its own app context and DB connection)."""
+    threading.Thread(target=copy_current_request_context(fn), daemon=True).start()
+
+
+def coalesced(*entities, stale_seconds=RESPONSE_STALE_SECONDS, max_size=256):
+    """
+    Decorator for GET views whose body depends only on the given catalog
+    entities and the request URL (place it under @conditional). Concurrent
+    requests for the same URL and catalog version wait for one computation
+    (up to SINGLE_FLIGHT_TIMEOUT) and share it, also across workers. After a catalog write, the
+    previous version's response keeps being served for up to stale_seconds,
+    with that version's ETag, while it is recomputed in the background;
+    stale_seconds=0 always waits for the current version. Streamed (NDJSON)
+    requests bypass the cache.
+    """
+    def decorator(f):
+        cache = StaleWhileRevalidateCache(
+            max_size=max_size, ttl=RESPONSE_CACHE_TTL, stale_ttl=stale_seconds,
+            flight=_response_flight(), cacheable=_cacheable, background=_in_request_thread
+        )
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or wants_ndjson():
+                return f(*args, **kwargs)
+
+            etag, last_modified = catalog_etag(entities)
+            if etag is None:
+                return f(*args, **kwargs)
+
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            snapshot, fresh = cache.get(
+                key, etag, lambda: _snapshot(make_response(f(*args, **kwargs)), etag, last_modified)
+            )
+            response = make_response(snapshot.body, snapshot.status, snapshot.headers)
+            if not fresh and snapshot.status == 200:
+                _set_validators(response, snapshot.etag, snapshot.last_modified,
+                                'public, max-age=0, must-revalidate', ())
+            return response
+
+        decorated_function.response_cache = cache
+        return decorated_function
+    return decorator
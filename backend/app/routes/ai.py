@@ -1,11 +1,14 @@
 from flask import Blueprint, request, jsonify
 from ..services.ai_service import ai_service
-from ..security import sanitize_string, validate_text_field, require_auth
+from ..security import sanitize_string, validate_text_field, require_auth, rate_limit
+from ..http_cache import coalesced
+from ..catalog import CARS
 
 bp = Blueprint('ai', __name__, url_prefix='/api')
 
 
 @bp.route('/chatbot', methods=['POST'])
+@rate_limit(max_requests=20, window_seconds=60)  # Gemini calls are the most expensive path
 def chatbot():
     # Optional auth check - chatbot can work for guests too
     user = require_auth()
@@ -54,6 +57,7 @@ def chatbot():
     return jsonify({'success': True, 'response': result})
 
 @bp.route('/price-estimate', methods=['POST'])
+@rate_limit(max_requests=60, window_seconds=60)
 def price_estimate():
     if not request.is_json:
         return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
@@ -83,6 +87,8 @@ def price_estimate():
     })
 
 @bp.route('/semantic-search', methods=['GET'])
+@rate_limit(max_requests=60, window_seconds=60)  # Scores the whole catalog per call
+@coalesced(CARS)
 def semantic_search():
     query = sanitize_string(request.args.get('q', ''))[:500]
     if not query:
@@ -99,6 +105,7 @@ def semantic_search():
     return jsonify({'success': True, 'results': results})
 
 @bp.route('/vision-helper', methods=['POST'])
+@rate_limit(max_requests=10, window_seconds=60)  # Image uploads up to 10MB
 def vision_helper():
     user = require_auth()
     if not user:
@@ -138,6 +145,7 @@ def vision_helper():
     return jsonify({'success': True, 'attributes': attributes})
 
 @bp.route('/listing-assistant', methods=['POST'])
+@rate_limit(max_requests=20, window_seconds=60)
 def listing_assistant():
     user = require_auth()
     if not user:
@@ -1,11 +1,20 @@
-from flask import Blueprint, request, jsonify, g
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, g, current_app
 from ..db import get_db
+from ..cache import TTLCache
+from ..services.password_service import password_service, PasswordHasherBusy
+from ..services.session_sweeper import cap_user_sessions
+from ..services import invalidation
+from ..services.access_tokens import (
+    ACCESS_TOKEN_TTL, signed_tokens_enabled, is_access_token,
+    issue_access_token, decode_access_token, user_from_claims, revocation_list, session_id
+)
 from ..security import (
     validate_username, validate_email, validate_password,
     sanitize_string, rate_limit, validate_json_request
 )
+import os
 import secrets
+import time
 from datetime import datetime, timedelta
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -13,31 +22,127 @@ bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 def generate_token():
     return secrets.token_urlsafe(32)
 
-def get_user_from_token(token):
-    if not token:
+# Per-worker cache of session token -> user. Entries never outlive the session
+# itself; logout and session pruning evict them explicitly.
+_session_cache = TTLCache(
+    max_size=int(os.environ.get('SESSION_CACHE_SIZE', 10000)),
+    ttl=int(os.environ.get('SESSION_CACHE_TTL', 60))
+)
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
         return None
-    
-    # Sanitize token input
-    token = sanitize_string(token)[:64]  # Tokens shouldn't be longer than this
-    
+
+def _load_session_user(token):
+    """Look up the user for a session token. Returns (user, expires_at)."""
     db = get_db()
     # Check for valid session using parameterized query (already safe)
     row = db.execute('''
-        SELECT u.id, u.username, u.email, u.role, u.created_at
+        SELECT u.id, u.username, u.email, u.role, u.created_at, s.expires_at
         FROM users u
         JOIN user_sessions s ON u.id = s.user_id
         WHERE s.token = ? AND (s.expires_at IS NULL OR s.expires_at > CURRENT_TIMESTAMP)
     ''', (token,)).fetchone()
     
     if row:
-        return {
+        user = {
             'id': row['id'],
             'username': row['username'],
             'email': row['email'],
             'role': row['role'],
             'created_at': row['created_at']
         }
-    return None
+        return user, _parse_timestamp(row['expires_at'])
+    return None, None
+
+def _decode_unrevoked(token):
+    """Claims of a valid signed access token that has not been revoked, else None."""
+    claims = decode_access_token(token, current_app.config['SECRET_KEY'])
+    if not claims:
+        return None
+    if revocation_list.needs_sync():
+        try:
+            revocation_list.sync(get_db())
+        except Exception as e:
+            # Keep verifying against the last synced set rather than failing auth
+            print(f"[Auth] Revocation sync failed: {e}")
+    if revocation_list.is_revoked(claims['jti']):
+        return None
+    return claims
+
+def get_user_from_token(token):
+    if not token:
+        return None
+    
+    # Sanitize token input
+    token = sanitize_string(token)
+    if not is_access_token(token):
+        token = token[:64]  # Session tokens shouldn't be longer than this
+    
+    # Memoize per request so require_auth and route helpers share one lookup
+    memo = g.setdefault('auth_users', {})
+    if token in memo:
+        return memo[token]
+    
+    if is_access_token(token):
+        # Signed access token: verified from its claims, no database round trip
+        claims = _decode_unrevoked(token)
+        user = user_from_claims(claims) if claims else None
+        memo[token] = user
+        return user
+    
+    user = _session_cache.get(token)
+    if user is None:
+        user, expires_at = _load_session_user(token)
+        if user:
+            ttl = _session_cache.ttl
+            if expires_at:
+                ttl = min(ttl, (expires_at - datetime.utcnow()).total_seconds())
+            _session_cache.set(token, user, ttl=ttl)
+    
+    user = dict(user) if user else None
+    memo[token] = user
+    return user
+
+def invalidate_session(token):
+    """Drop a session token from this worker's caches."""
+    _session_cache.delete(token)
+    g.get('auth_users', {}).pop(token, None)
+
+def invalidate_user_sessions(user_id):
+    """Drop every cached session belonging to a user."""
+    _session_cache.delete_where(lambda token, user: user['id'] == user_id)
+    memo = g.get('auth_users', {})
+    for token in [t for t, u in memo.items() if u and u['id'] == user_id]:
+        memo.pop(token)
+
+def _on_sessions_event(event):
+    invalidate_user_sessions(int(event['id']))
+
+def _on_revocation_event(event):
+    # The token expires within ACCESS_TOKEN_TTL of the revocation at the latest
+    revocation_list.remember(event['id'], time.time() + ACCESS_TOKEN_TTL)
+
+# Other workers publish user ids (never tokens) when sessions end
+invalidation.subscribe(invalidation.SESSIONS, _on_sessions_event)
+invalidation.subscribe(invalidation.REVOCATIONS, _on_revocation_event)
+
+def _token_fields(user, session_token):
+    """Token fields of a login/signup response for the configured AUTH_TOKEN_MODE."""
+    if not signed_tokens_enabled():
+        return {'token': session_token}
+    # The session token becomes the long-lived refresh token
+    access_token, _ = issue_access_token(user, current_app.config['SECRET_KEY'], session_token)
+    return {'token': access_token, 'refreshToken': session_token, 'expiresIn': ACCESS_TOKEN_TTL}
+
+def _hasher_busy_response():
+    response = jsonify({'success': False, 'error': 'Server is busy. Please try again shortly.'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
 
 @bp.route('/signup', methods=['POST'])
 @rate_limit(max_requests=5, window_seconds=60)  # 5 signups per minute per IP
@@ -63,10 +168,14 @@ def signup():
     if not valid:
         return jsonify({'success': False, 'error': error}), 400
 
+    try:
+        # Hashing runs on the password pool (PASSWORD_HASH_METHOD, pbkdf2:sha256 by default)
+        password_hash = password_service.hash_password(password)
+    except PasswordHasherBusy:
+        return _hasher_busy_response()
+
     db = get_db()
     try:
-        # Use werkzeug's secure password hashing (pbkdf2:sha256 by default)
-        password_hash = generate_password_hash(password, method='pbkdf2:sha256:260000')
         cursor = db.execute(
             'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
             (username, email, password_hash)
@@ -82,16 +191,13 @@ def signup():
         )
         db.commit()
 
-        return jsonify({
-            'success': True,
-            'token': token,
-            'user': {
-                'id': user_id,
-                'username': username,
-                'email': email,
-                'role': 'user'
-            }
-        }), 201
+        user = {
+            'id': user_id,
+            'username': username,
+            'email': email,
+            'role': 'user'
+        }
+        return jsonify({'success': True, **_token_fields(user, token), 'user': user}), 201
 
     except Exception as e:
         error_str = str(e).lower()
@@ -120,20 +226,28 @@ def login():
         (identifier.lower(), identifier)
     ).fetchone()
 
-    # Use constant-time comparison via check_password_hash
-    if user and check_password_hash(user['password_hash'], password):
+    # Use constant-time comparison via check_password_hash (on the password pool)
+    try:
+        matches, needs_rehash = password_service.verify_password(user['password_hash'], password) if user else (False, False)
+    except PasswordHasherBusy:
+        return _hasher_busy_response()
+
+    if matches:
+        if needs_rehash:
+            # Cost parameters changed since this hash was made; upgrade it transparently
+            try:
+                db.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                           (password_service.hash_password(password), user['id']))
+            except Exception as e:
+                print(f"Password rehash skipped for user {user['id']}: {e}")
+
         token = generate_token()
         expires_at = datetime.utcnow() + timedelta(days=7)
         
-        # Clean up old sessions for this user (keep last 5)
-        db.execute('''
-            DELETE FROM user_sessions 
-            WHERE user_id = ? AND token NOT IN (
-                SELECT token FROM user_sessions 
-                WHERE user_id = ? 
-                ORDER BY created_at DESC LIMIT 5
-            )
-        ''', (user['id'], user['id']))
+        # Clean up expired and surplus sessions for this user (keep last MAX_SESSIONS_PER_USER)
+        cap_user_sessions(db, user['id'])
+        invalidate_user_sessions(user['id'])
+        invalidation.publish(db, invalidation.SESSIONS, user['id'])
         
         db.execute(
             'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
@@ -141,30 +255,79 @@ def login():
         )
         db.commit()
 
-        return jsonify({
-            'success': True,
-            'token': token,
-            'user': {
-                'id': user['id'],
-                'username': user['username'],
-                'email': user['email'],
-                'role': user['role']
-            }
-        })
+        user_info = {
+            'id': user['id'],
+            'username': user['username'],
+            'email': user['email'],
+            'role': user['role']
+        }
+        fields = _token_fields(dict(user_info, created_at=user['created_at']), token)
+        return jsonify({'success': True, **fields, 'user': user_info})
     
     # Generic error to prevent user enumeration
     return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
 
+def _end_session(db, token):
+    """Delete a session and tell the other workers to drop its user's cached sessions. The caller commits."""
+    for row in db.execute('DELETE FROM user_sessions WHERE token = ? RETURNING user_id', (token,)).fetchall():
+        invalidation.publish(db, invalidation.SESSIONS, row['user_id'])
+
+def _refresh_token_for(db, claims):
+    """The refresh (session) token an access token was issued from, found by its sid claim."""
+    sid = claims.get('sid')
+    if not sid:
+        return None
+    # At most MAX_SESSIONS_PER_USER rows (idx_user_sessions_user_created)
+    for row in db.execute('SELECT token FROM user_sessions WHERE user_id = ?', (claims['uid'],)).fetchall():
+        if session_id(row['token']) == sid:
+            return row['token']
+    return None
+
 @bp.route('/logout', methods=['POST'])
+@rate_limit(max_requests=30, window_seconds=60)
 def logout():
     token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if token:
+    if token and is_access_token(token):
+        # Signed mode: revoke the access token and end the refresh session it was issued from
+        # (or the one sent in the body)
+        claims = decode_access_token(sanitize_string(token), current_app.config['SECRET_KEY'])
+        data = request.get_json(silent=True) or {}
+        db = get_db()
+        refresh_token = sanitize_string(data.get('refreshToken') or '')[:64]
+        if claims:
+            revocation_list.revoke(db, claims['jti'], claims['exp'])
+            invalidation.publish(db, invalidation.REVOCATIONS, claims['jti'])
+            refresh_token = _refresh_token_for(db, claims) or refresh_token
+        if refresh_token:
+            _end_session(db, refresh_token)
+        db.commit()
+        invalidate_session(sanitize_string(token))
+        if refresh_token:
+            invalidate_session(refresh_token)
+    elif token:
         token = sanitize_string(token)[:64]
         db = get_db()
-        db.execute('DELETE FROM user_sessions WHERE token = ?', (token,))
+        _end_session(db, token)
         db.commit()
+        invalidate_session(token)
     return jsonify({'success': True})
 
+@bp.route('/refresh', methods=['POST'])
+@rate_limit(max_requests=30, window_seconds=60)
+@validate_json_request(required_fields=['refreshToken'])
+def refresh():
+    """Exchange a refresh (session) token for a new signed access token."""
+    if not signed_tokens_enabled():
+        return jsonify({'success': False, 'error': 'Token refresh is not enabled'}), 400
+    
+    refresh_token = sanitize_string(g.validated_data.get('refreshToken') or '')[:64]
+    user, _ = _load_session_user(refresh_token)
+    if not user:
+        return jsonify({'success': False, 'error': 'Invalid or expired refresh token'}), 401
+    
+    access_token, _ = issue_access_token(user, current_app.config['SECRET_KEY'], refresh_token)
+    return jsonify({'success': True, 'token': access_token, 'expiresIn': ACCESS_TOKEN_TTL})
+
 @bp.route('/verify', methods=['GET'])
 @rate_limit(max_requests=30, window_seconds=60)
 def verify_session():
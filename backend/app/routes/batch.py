@@ -0,0 +1,56 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from ..security import rate_limit, validate_json_request
+
+# Multiplexes several GET calls into one round trip. Sub-requests run as nested
+# request contexts inside this request's app context, so they share g: one DB
+# connection (get_db) and one auth lookup per token (get_user_from_token memo).
+bp = Blueprint('batch', __name__, url_prefix='/api/batch')
+
+BATCH_MAX_REQUESTS = 10
+
+# Request headers passed through to every sub-request
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language', 'X-Forwarded-For')
+
+def _run_subrequest(path, headers):
+    app = current_app._get_current_object()
+    with app.test_request_context(path, method='GET', headers=headers,
+                                  environ_base={'REMOTE_ADDR': request.remote_addr}):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            print(f"[Batch] {path} failed: {e}")
+            return 500, {'success': False, 'error': 'Internal error'}
+        body = response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+        return response.status_code, body
+
+@bp.route('', methods=['POST'])
+@rate_limit(max_requests=30, window_seconds=60)
+@validate_json_request(required_fields=['requests'])
+def batch():
+    """
+    Body: {"requests": [{"id": "makes", "path": "/api/makes"}, ...]} (GET only).
+    Returns {"responses": [{"id", "path", "status", "body"}, ...]} in request order.
+    """
+    items = g.validated_data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'requests must be a non-empty list'}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_REQUESTS} requests per batch'}), 400
+
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    responses = []
+    for item in items:
+        item = item if isinstance(item, dict) else {'path': item}
+        path = str(item.get('path') or '')
+        method = str(item.get('method') or 'GET').upper()
+
+        if method != 'GET':
+            status, body = 405, {'success': False, 'error': 'Only GET sub-requests are supported'}
+        elif not path.startswith('/api/') or path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            status, body = 400, {'success': False, 'error': 'path must be an /api/ endpoint other than /api/batch'}
+        else:
+            status, body = _run_subrequest(path, headers)
+
+        responses.append({'id': item.get('id'), 'path': path, 'status': status, 'body': body})
+
+    return jsonify({'success': True, 'responses': responses})
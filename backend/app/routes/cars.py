@@ -1,122 +1,309 @@
 from flask import Blueprint, request, jsonify, current_app
-from ..db import get_db
-from ..security import sanitize_string, sanitize_search_query, validate_text_field, validate_integer, validate_float, require_auth
+from ..db import get_db, iter_row_batches
+from ..security import sanitize_string, validate_text_field, validate_integer, validate_float, require_auth
+from ..services.catalog_index import catalog_index
+from ..services.taxonomy import taxonomy
+from ..services.text_normalization import normalize_query, refresh_search_text
+from ..services.facets import parse_facets, compute_facets
+from ..services.listing_counts import listing_total
+from ..catalog import bump_catalog_version, CARS
+from ..http_cache import conditional, coalesced
+from ..serializers import (
+    serialize_car, serialize_cars, json_response, render_cards, store_cards, refresh_cards,
+    card_list_response, dumps, wants_ndjson, ndjson_response,
+    CANONICAL_KEYS, CAR_COLUMNS, CARD_COLUMNS, CARD_FORMAT_VERSION
+)
 import json
 
 bp = Blueprint('cars', __name__, url_prefix='/api/cars')
 
+STREAM_MAX_LIMIT = 10000
+STREAM_BATCH_SIZE = 200
+BATCH_MAX_IDS = 100
+SEARCH_MAX_TERMS = 6
+
+# (query argument, column, operator, parser)
+RANGE_FILTERS = (
+    ('min_price', 'price', '>=', float),
+    ('max_price', 'price', '<=', float),
+    ('min_year', 'year', '>=', int),
+    ('max_year', 'year', '<=', int),
+    ('max_odometer', 'odometer_km', '<=', int),
+    ('min_horsepower', 'horsepower', '>=', int),
+    ('max_horsepower', 'horsepower', '<=', int),
+)
+
+# Bound that closes a one-sided range (min without max, or max without min).
+# SQLite's planner (no STAT4) prices an open range at 1/4 of the table and then
+# prefers walking the sort index; a closed range prices at 1/64, so the range
+# index is searched. An int, so PostgreSQL keeps integer columns' indexes usable.
+OPEN_RANGE_BOUND = 2 ** 62
+
+# ?sort= values (SortOption in src/lib/types.ts) -> ORDER BY. Each has a
+# matching index in db.INDEXES; id breaks ties so pages never overlap.
+SORT_ORDERS = {
+    'newest': 'created_at DESC, id DESC',
+    'price-asc': 'price ASC, id ASC',
+    'price-desc': 'price DESC, id DESC',
+    'year-desc': 'year DESC, id DESC',
+    'rating-desc': 'rating DESC, id DESC',
+}
+
+# Named column sets for ?fields=
+FIELD_PRESETS = {
+    'card': CARD_COLUMNS,
+    'detail': CAR_COLUMNS,
+}
+
+# Frontend (camelCase) names accepted in ?fields= alongside column names
+FIELD_ALIASES = {key: column for column, key in CANONICAL_KEYS.items()}
+
+def parse_fields(value, default=None):
+    """
+    Resolve a ?fields= value (comma separated presets and/or field names) to a
+    tuple of cars columns. Returns `default` (None means every column) when empty.
+    Unknown names are ignored; 'id' is always included.
+    """
+    if not value:
+        return default
+    columns = []
+    for name in value.split(','):
+        name = name.strip()
+        if name in FIELD_PRESETS:
+            columns.extend(FIELD_PRESETS[name])
+        else:
+            column = FIELD_ALIASES.get(name, name)
+            if column in CAR_COLUMNS:
+                columns.append(column)
+    if not columns:
+        return default
+    return tuple(dict.fromkeys(['id'] + columns))
+
+def car_select_list(columns, alias=None):
+    """SQL select list for parse_fields() output. Column names come from CAR_COLUMNS only."""
+    prefix = f"{alias}." if alias else ''
+    if columns is None:
+        return f"{prefix}*"
+    return ', '.join(prefix + column for column in columns)
+
 def car_row_to_dict(row):
-    """Helper to convert DB row to dictionary with parsed JSON fields."""
-    d = dict(row)
-    for field in ['specs', 'engines', 'statistics', 'gallery_images', 'media_gallery', 'image_urls', 'source_sheets']:
-        if d.get(field):
-            # Handle both string (SQLite) and already-parsed (PostgreSQL JSONB) data
-            if isinstance(d[field], str):
-                try:
-                    d[field] = json.loads(d[field])
-                except:
-                    d[field] = None
-            # If it's already a list/dict (PostgreSQL), keep it as-is
-    # Map image_url to image for frontend compatibility
-    if d.get('image_url') and not d.get('image'):
-        d['image'] = d['image_url']
-    # Map gallery_images to galleryImages for frontend compatibility (camelCase)
-    if d.get('gallery_images'):
-        d['galleryImages'] = d['gallery_images']
-    # Map media_gallery to mediaGallery for frontend compatibility
-    if d.get('media_gallery'):
-        d['mediaGallery'] = d['media_gallery']
-    # Map video_url to videoUrl for frontend
-    if d.get('video_url'):
-        d['videoUrl'] = d['video_url']
-    # Map odometer_km to odometerKm for frontend
-    if d.get('odometer_km') is not None:
-        d['odometerKm'] = d['odometer_km']
-    # Map snake_case to camelCase for new fields
-    if d.get('exterior_color'):
-        d['exteriorColor'] = d['exterior_color']
-    if d.get('interior_color'):
-        d['interiorColor'] = d['interior_color']
-    if d.get('fuel_type'):
-        d['fuelType'] = d['fuel_type']
-    if d.get('regional_spec'):
-        d['regionalSpec'] = d['regional_spec']
-    if d.get('payment_type'):
-        d['paymentType'] = d['payment_type']
-    return d
+    """Convert a single cars row to the API dict (see app/serializers.py)."""
+    return serialize_car(row)
 
-@bp.route('', methods=['GET'])
-def get_cars():
-    db = get_db()
-    args = request.args
-    
-    base_query = "FROM cars WHERE 1=1"
+def build_car_filters(args):
+    """
+    Translate listing filter arguments (make, category, search, ...) into SQL
+    conditions. Returns (" AND ..." clause to append to a WHERE, params).
+    """
+    conditions = ""
     params = []
 
     # Sanitize and validate make filter
     make = args.get('make')
     if make and make != 'all':
         make = sanitize_string(make)[:50]  # Limit length
-        base_query += " AND make = ?"
+        conditions += " AND make = ?"
         params.append(make)
     
     # Category filter
     category = args.get('category')
     if category and category != 'all':
         category = sanitize_string(category)[:20]
-        base_query += " AND (category = ? OR category IS NULL)"
+        conditions += " AND (category = ? OR category IS NULL)"
         params.append(category)
     
     # Condition filter
     condition = args.get('condition')
     if condition and condition != 'all':
         condition = sanitize_string(condition)[:20]
-        base_query += " AND condition = ?"
+        conditions += " AND condition = ?"
         params.append(condition)
     
     # Transmission filter
     transmission = args.get('transmission')
     if transmission and transmission != 'all':
         transmission = sanitize_string(transmission)[:20]
-        base_query += " AND transmission = ?"
+        conditions += " AND transmission = ?"
         params.append(transmission)
     
     # Fuel type filter
     fuel_type = args.get('fuelType')
     if fuel_type and fuel_type != 'all':
         fuel_type = sanitize_string(fuel_type)[:20]
-        base_query += " AND fuel_type = ?"
+        conditions += " AND fuel_type = ?"
         params.append(fuel_type)
     
-    # Sanitize search query
+    # Range filters (price in listing currency, model year, mileage, horsepower)
+    ranges = {}
+    for key, column, operator, parse in RANGE_FILTERS:
+        value = args.get(key)
+        if value in (None, ''):
+            continue
+        try:
+            value = parse(value)
+        except (TypeError, ValueError):
+            continue
+        conditions += f" AND {column} {operator} ?"
+        params.append(value)
+        ranges.setdefault(column, (set(), parse))[0].add(operator)
+    for column, (operators, parse) in ranges.items():
+        if len(operators) == 1:
+            # Always true for non-NULL values, which the given bound already requires
+            operator, bound = ('<=', OPEN_RANGE_BOUND) if '>=' in operators else ('>=', -OPEN_RANGE_BOUND)
+            conditions += f" AND {column} {operator} ?"
+            params.append(parse(bound))
+    
+    # Body style filter (generated column, stored lowercase)
+    body_style = args.get('body_style')
+    if body_style and body_style != 'all':
+        body_style = sanitize_string(body_style)[:30].strip().lower()
+        conditions += " AND body_style = ?"
+        params.append(body_style)
+    
+    # City filter
+    city = args.get('city')
+    if city and city != 'all':
+        city = sanitize_string(city)[:100]
+        conditions += " AND city = ?"
+        params.append(city)
+    
+    # Search: every term must appear in the car's normalized make/model/trim.
+    # The query goes through the same normalization as the stored text, so
+    # "مرسيدس" and "Mercedes-Benz" match like "mercedes benz" (terms are word
+    # characters only, so no LIKE escaping is needed).
     search = args.get('search')
     if search:
-        search = sanitize_search_query(search)[:100]  # Limit length
-        search_pattern = f"%{search}%"
-        base_query += " AND (make LIKE ? ESCAPE '\\' OR model LIKE ? ESCAPE '\\')"
-        params.extend([search_pattern, search_pattern])
+        terms = normalize_query(str(search)[:100]).split()[:SEARCH_MAX_TERMS]
+        if not terms:
+            conditions += " AND 1 = 0"
+        for term in terms:
+            conditions += " AND search_text LIKE ?"
+            params.append(f"%{term}%")
+    
+    return conditions, params
+
+def order_clause(sort):
+    """ORDER BY clause for a ?sort= value; unknown values and 'default' mean newest first."""
+    return f"ORDER BY {SORT_ORDERS.get(sort, SORT_ORDERS['newest'])}"
 
-    # Get total count first
-    count_cursor = db.execute(f"SELECT COUNT(*) as total {base_query}", params)
-    total = count_cursor.fetchone()['total']
+def _card_page(db, base_query, params, total, extra=None, order=None):
+    rows = db.execute(
+        f"SELECT id, card_json, card_version {base_query} {order or order_clause(None)} LIMIT ? OFFSET ?", params
+    ).fetchall()
+    
+    # Cars added by the import scripts, or rendered by an older card format, are rendered now
+    stale = [row['id'] for row in rows if not row['card_json'] or row['card_version'] != CARD_FORMAT_VERSION]
+    rendered = render_cards(db, stale)
+    if rendered:
+        try:
+            store_cards(db, rendered)
+            db.commit()
+        except Exception as e:
+            # Serving the page matters more than saving the backfill
+            db.rollback()
+            print(f"Card backfill error: {e}")
+    
+    fragments = [rendered.get(row['id']) or row['card_json'] for row in rows]
+    return card_list_response(fragments, total, extra)
 
+def _stream_cars(db, base_query, params, fields, order=None):
+    """Yield NDJSON chunks, one per fetched batch, one car per line."""
+    order = f"{order or order_clause(None)} LIMIT ? OFFSET ?"
+    if fields == 'card':
+        sql = f"SELECT id, card_json, card_version {base_query} {order}"
+        for rows in iter_row_batches(db, sql, params, STREAM_BATCH_SIZE):
+            # Stale cards are rendered but not stored: the stream stays read-only
+            stale = [row['id'] for row in rows if not row['card_json'] or row['card_version'] != CARD_FORMAT_VERSION]
+            rendered = render_cards(db, stale)
+            yield ''.join((rendered.get(row['id']) or row['card_json']) + '\n' for row in rows)
+        return
+    
+    sql = f"SELECT {car_select_list(parse_fields(fields))} {base_query} {order}"
+    for rows in iter_row_batches(db, sql, params, STREAM_BATCH_SIZE):
+        yield b''.join(dumps(car) + b'\n' for car in serialize_cars(rows))
+
+@bp.route('', methods=['GET'])
+@conditional(CARS, max_age=30, vary=('Accept',))
+@coalesced(CARS)
+def get_cars():
+    db = get_db()
+    args = request.args
+    
+    conditions, params = build_car_filters(args)
+    base_query = f"FROM cars WHERE 1=1{conditions}"
+
+    # Cached exact count, planner estimate or none (?count=); see services/listing_counts.py
+    total, total_exact = listing_total(db, base_query, params, args)
+
+    # Streamed responses hold one batch in memory at a time, so they may ask for more rows
+    stream = wants_ndjson()
+    max_limit = STREAM_MAX_LIMIT if stream else 1000
+    
     # Validate pagination parameters - default to 1000 (effectively all) if not specified
     try:
-        limit = min(int(args.get('limit', 1000)), 1000)  # Max 1000 per request
+        limit = min(int(args.get('limit', 1000)), max_limit)  # Max 1000 per request (non-streamed)
         offset = max(int(args.get('offset', 0)), 0)
     except ValueError:
         limit = 1000
         offset = 0
     
-    query = f"SELECT * {base_query} ORDER BY created_at DESC LIMIT ? OFFSET ?"
     params.extend([limit, offset])
+    
+    order = order_clause(args.get('sort'))
+    
+    if stream:
+        headers = {'X-Total-Exact': 'true' if total_exact else 'false'}
+        if total is not None:
+            headers['X-Total-Count'] = str(total)
+        return ndjson_response(_stream_cars(db, base_query, params, args.get('fields'), order), headers=headers)
+    
+    # Sidebar counts (?facets=1 or ?facets=make,city), one grouped query for all facets
+    facet_names = parse_facets(args.get('facets'))
+    extra = {'totalExact': total_exact}
+    if facet_names:
+        extra['facets'] = compute_facets(db, args, facet_names, build_car_filters)
+    
+    if args.get('fields') == 'card':
+        # Listing grid: concatenate the stored card JSON instead of building dicts
+        return _card_page(db, base_query, params, total, extra, order)
+    
+    columns = parse_fields(args.get('fields'))
+    query = f"SELECT {car_select_list(columns)} {base_query} {order} LIMIT ? OFFSET ?"
 
     cursor = db.execute(query, params)
-    cars = [car_row_to_dict(row) for row in cursor.fetchall()]
+    cars = serialize_cars(cursor.fetchall())
     
-    return jsonify({'success': True, 'cars': cars, 'total': total})
+    return json_response({'success': True, 'cars': cars, 'total': total, **extra})
+
+@bp.route('/batch', methods=['GET'])
+@conditional(CARS, max_age=60)
+def get_cars_batch():
+    """Fetch several cars by id in one query: /api/cars/batch?ids=3,1,2[&fields=card]. Order is preserved."""
+    raw_ids = [part.strip() for part in request.args.get('ids', '').split(',') if part.strip()]
+    if not raw_ids:
+        return jsonify({'success': False, 'error': 'ids is required'}), 400
+    if not all(part.isdigit() and int(part) > 0 for part in raw_ids):
+        return jsonify({'success': False, 'error': 'ids must be positive integers'}), 400
+    
+    ids = list(dict.fromkeys(int(part) for part in raw_ids))
+    if len(ids) > BATCH_MAX_IDS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_IDS} ids per request'}), 400
+    
+    db = get_db()
+    columns = parse_fields(request.args.get('fields'))
+    placeholders = ','.join(['?'] * len(ids))
+    rows = db.execute(f"SELECT {car_select_list(columns)} FROM cars WHERE id IN ({placeholders})", ids).fetchall()
+    
+    found = {car['id']: car for car in serialize_cars(rows)}
+    return json_response({
+        'success': True,
+        'cars': [found[car_id] for car_id in ids if car_id in found],
+        'missing': [car_id for car_id in ids if car_id not in found],
+    })
 
 @bp.route('/<int:id>', methods=['GET'])
+@conditional(CARS, max_age=60)
+@coalesced(CARS, stale_seconds=0)  # Owners reload a listing right after editing it
 def get_car(id):
     # id is already validated as int by Flask's route converter
     if id < 1:
@@ -220,7 +407,12 @@ def create_car():
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
             (owner_id, make, model, year, price, currency, odometer_km, description, json.dumps(specs), image_url, video_url, json.dumps(gallery_images), json.dumps(media_gallery), category, condition, exterior_color, interior_color, transmission, fuel_type, regional_spec, payment_type, city, neighborhood, trim)
         )
+        refresh_cards(db, [cursor.lastrowid])
+        refresh_search_text(db, [cursor.lastrowid])
+        bump_catalog_version(db, CARS, ids=[cursor.lastrowid])
         db.commit()
+        catalog_index.invalidate()
+        taxonomy.apply_write(db, [cursor.lastrowid])
         return jsonify({'success': True, 'id': cursor.lastrowid}), 201
     except Exception as e:
         print(f"Create car error: {e}")
@@ -367,7 +559,12 @@ def update_car(id):
     try:
         query = f"UPDATE cars SET {', '.join(updates)} WHERE id = ?"
         db.execute(query, params)
+        refresh_cards(db, [id])
+        refresh_search_text(db, [id])
+        bump_catalog_version(db, CARS, ids=[id])
         db.commit()
+        catalog_index.invalidate()
+        taxonomy.apply_write(db, [id])
         
         # Return updated car
         updated_car = db.execute("SELECT * FROM cars WHERE id = ?", (id,)).fetchone()
@@ -396,7 +593,10 @@ def delete_car(id):
     
     try:
         db.execute("DELETE FROM cars WHERE id = ?", (id,))
+        bump_catalog_version(db, CARS, ids=[id])
         db.commit()
+        catalog_index.invalidate()
+        taxonomy.apply_write(db, [id])
         return jsonify({'success': True, 'message': 'Listing deleted'})
     except Exception as e:
         print(f"Delete car error: {e}")
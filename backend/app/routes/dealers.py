@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request
 from ..db import get_db
 from ..security import require_auth
+from ..catalog import bump_catalog_version, CARS, DEALERS
+from ..http_cache import conditional
+from .cars import parse_fields, car_select_list, FIELD_PRESETS
+from ..serializers import serialize_cars
 import json
 import math
 
@@ -21,6 +25,7 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 @bp.route('', methods=['GET'])
+@conditional(DEALERS, max_age=120)
 def get_dealers():
     """Get all dealers or filter by location"""
     db = get_db()
@@ -69,6 +74,7 @@ def get_dealers():
     return jsonify({'success': True, 'dealers': dealers})
 
 @bp.route('/<int:id>', methods=['GET'])
+@conditional(DEALERS, CARS, max_age=60)
 def get_dealer(id):
     """Get detailed dealer information"""
     db = get_db()
@@ -97,13 +103,14 @@ def get_dealer(id):
     else:
         dealer['business_hours'] = {}
     
-    # Get dealer's inventory
-    inventory_cursor = db.execute('''
-        SELECT * FROM cars 
+    # Get dealer's inventory (card fields unless ?fields= asks for more)
+    columns = parse_fields(request.args.get('fields'), default=FIELD_PRESETS['card'])
+    inventory_cursor = db.execute(f'''
+        SELECT {car_select_list(columns)} FROM cars 
         WHERE owner_id = (SELECT user_id FROM dealers WHERE id = ?)
         ORDER BY created_at DESC
     ''', (id,))
-    dealer['inventory'] = [dict(row) for row in inventory_cursor.fetchall()]
+    dealer['inventory'] = serialize_cars(inventory_cursor.fetchall())
     
     # Get dealer reviews (from reviews table)
     reviews_cursor = db.execute('''
@@ -165,8 +172,9 @@ def register_dealer():
         False  # Requires admin verification
     ))
     
-    db.commit()
     dealer_id = cursor.lastrowid
+    bump_catalog_version(db, DEALERS, ids=[dealer_id])
+    db.commit()
     
     return jsonify({
         'success': True,
@@ -261,6 +269,7 @@ def update_dealer_profile():
     query = f"UPDATE dealers SET {', '.join(updates)} WHERE id = ?"
     
     db.execute(query, params)
+    bump_catalog_version(db, DEALERS, ids=[dealer_id])
     db.commit()
     
     return jsonify({'success': True, 'message': 'Dealer profile updated'})
@@ -294,6 +303,7 @@ def upload_showroom_image():
         # Update database
         db.execute('UPDATE dealers SET showroom_images = ? WHERE id = ?', 
                   (json.dumps(showroom_images), dealer_id))
+        bump_catalog_version(db, DEALERS, ids=[dealer_id])
         db.commit()
         
         return jsonify({'success': True, 'showroom_images': showroom_images})
@@ -0,0 +1,71 @@
+from flask import Blueprint, request, jsonify, current_app, send_file
+from ..security import require_auth, rate_limit
+from ..services.catalog_export import (
+    ExportError, ExportBusy, EXPORT_FORMATS, available_formats, start_export_job, load_job, export_file_path
+)
+from .cars import build_car_filters
+
+bp = Blueprint('exports', __name__, url_prefix='/api/exports')
+
+def _job_payload(job):
+    payload = {key: job.get(key) for key in ('id', 'format', 'status', 'rows', 'size_bytes', 'error')}
+    if job['status'] == 'done':
+        payload['download_url'] = f"/api/exports/{job['id']}/download"
+    return payload
+
+def _load_own_job(job_id, user):
+    job = load_job(job_id)
+    if not job or (job.get('requested_by') != user['id'] and user.get('role') != 'admin'):
+        return None
+    return job
+
+@bp.route('', methods=['POST'])
+@rate_limit(max_requests=5, window_seconds=60)
+def create_export():
+    """Start a catalog export job. Body: {"format": "csv|ndjson|parquet", "filters": {make, category, ...}}."""
+    user = require_auth()
+    if not user:
+        return jsonify({'success': False, 'error': 'Authentication required'}), 401
+
+    data = request.get_json(silent=True) or {}
+    fmt = str(data.get('format', 'csv')).lower()
+    filters = data.get('filters') if isinstance(data.get('filters'), dict) else {}
+
+    # Same filter semantics as GET /api/cars
+    where_sql, params = build_car_filters(filters)
+
+    try:
+        job = start_export_job(current_app._get_current_object(), fmt, where_sql, params, requested_by=user['id'])
+    except ExportBusy as e:
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except ExportError as e:
+        return jsonify({'success': False, 'error': str(e), 'formats': available_formats()}), 400
+
+    return jsonify({'success': True, 'job': _job_payload(job)}), 202
+
+@bp.route('/<job_id>', methods=['GET'])
+def get_export(job_id):
+    user = require_auth()
+    if not user:
+        return jsonify({'success': False, 'error': 'Authentication required'}), 401
+
+    job = _load_own_job(job_id, user)
+    if not job:
+        return jsonify({'success': False, 'error': 'Export not found'}), 404
+    return jsonify({'success': True, 'job': _job_payload(job)})
+
+@bp.route('/<job_id>/download', methods=['GET'])
+def download_export(job_id):
+    user = require_auth()
+    if not user:
+        return jsonify({'success': False, 'error': 'Authentication required'}), 401
+
+    job = _load_own_job(job_id, user)
+    if not job:
+        return jsonify({'success': False, 'error': 'Export not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'success': False, 'error': f"Export is {job['status']}"}), 409
+
+    mimetype, extension = EXPORT_FORMATS[job['format']]
+    return send_file(export_file_path(job), mimetype=mimetype, as_attachment=True,
+                     download_name=f"intelliwheels-cars.{extension}")
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 import os
 from ..db import get_db
-from .auth import get_user_from_token
-from .cars import car_row_to_dict
+from ..security import require_auth
+from .cars import parse_fields, car_select_list
+from ..serializers import serialize_cars, json_response
 
 bp = Blueprint('favorites', __name__, url_prefix='/api/favorites')
 
@@ -12,28 +13,27 @@ def is_postgres():
 
 @bp.route('', methods=['GET'])
 def get_favorites():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = get_user_from_token(token)
+    user = require_auth()
     
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
 
     db = get_db()
-    cursor = db.execute('''
-        SELECT c.* 
+    columns = parse_fields(request.args.get('fields'))
+    cursor = db.execute(f'''
+        SELECT {car_select_list(columns, 'c')}
         FROM cars c
         JOIN favorites f ON c.id = f.car_id
         WHERE f.user_id = ?
         ORDER BY f.created_at DESC
     ''', (user['id'],))
     
-    cars = [car_row_to_dict(row) for row in cursor.fetchall()]
-    return jsonify({'success': True, 'cars': cars})
+    cars = serialize_cars(cursor.fetchall())
+    return json_response({'success': True, 'cars': cars})
 
 @bp.route('', methods=['POST'])
 def add_favorite():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = get_user_from_token(token)
+    user = require_auth()
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
 
@@ -80,8 +80,7 @@ def add_favorite():
 
 @bp.route('/<int:car_id>', methods=['DELETE'])
 def remove_favorite(car_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = get_user_from_token(token)
+    user = require_auth()
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
 
@@ -1,70 +1,69 @@
 from flask import Blueprint, jsonify, request
 from ..db import get_db
-from .auth import get_user_from_token
-from .cars import car_row_to_dict
+from ..security import require_auth
+from .cars import parse_fields, car_select_list
+from ..serializers import serialize_cars, json_response
+from ..catalog import CARS
+from ..http_cache import conditional
+from ..services.taxonomy import taxonomy
+from ..services import autocomplete
 
 # This blueprint will attach directly to /api to handle root-level resource endpoints
 # like /api/makes and /api/my-listings
 bp = Blueprint('listings', __name__, url_prefix='/api')
 
 @bp.route('/makes', methods=['GET'])
+@conditional(CARS, max_age=300)
 def get_makes():
     db = get_db()
-    cursor = db.execute('SELECT DISTINCT make FROM cars ORDER BY make ASC')
-    makes = [row['make'] for row in cursor.fetchall()]
-    return jsonify({'success': True, 'makes': makes})
+    taxonomy.ensure_current(db)
+    return jsonify({'success': True, 'makes': taxonomy.makes()})
 
 @bp.route('/models', methods=['GET'])
+@conditional(CARS, max_age=300)
 def get_models():
     """Get models for a specific make, or all make-model pairs."""
     db = get_db()
     make = request.args.get('make')
+    taxonomy.ensure_current(db)
     
     if make:
-        cursor = db.execute(
-            'SELECT DISTINCT model FROM cars WHERE LOWER(make) = LOWER(?) ORDER BY model ASC',
-            (make,)
-        )
-        models = [row['model'] for row in cursor.fetchall()]
-        return jsonify({'success': True, 'models': models})
-    else:
-        # Return all make-model pairs grouped
-        cursor = db.execute(
-            'SELECT DISTINCT make, model FROM cars ORDER BY make ASC, model ASC'
-        )
-        result = {}
-        for row in cursor.fetchall():
-            make_name = row['make']
-            if make_name not in result:
-                result[make_name] = []
-            result[make_name].append(row['model'])
-        return jsonify({'success': True, 'models_by_make': result})
+        return jsonify({'success': True, 'models': taxonomy.models(make)})
+    # Return all make-model pairs grouped
+    return jsonify({'success': True, 'models_by_make': taxonomy.models_by_make()})
 
 @bp.route('/engines', methods=['GET'])
+@conditional(CARS, max_age=300)
 def get_engines():
     """Get engines for a specific make/model."""
-    db = get_db()
     make = request.args.get('make')
     model = request.args.get('model')
     
     if not make or not model:
         return jsonify({'success': False, 'error': 'make and model required'}), 400
     
-    cursor = db.execute(
-        '''SELECT DISTINCT json_extract(specs, '$.engine') as engine 
-           FROM cars 
-           WHERE LOWER(make) = LOWER(?) AND LOWER(model) = LOWER(?)
-           AND json_extract(specs, '$.engine') IS NOT NULL
-           ORDER BY engine ASC''',
-        (make, model)
-    )
-    engines = [row['engine'] for row in cursor.fetchall() if row['engine']]
-    return jsonify({'success': True, 'engines': engines})
+    db = get_db()
+    taxonomy.ensure_current(db)
+    return jsonify({'success': True, 'engines': taxonomy.engines(make, model)})
+
+@bp.route('/autocomplete', methods=['GET'])
+@conditional(CARS, max_age=300)
+def get_autocomplete():
+    """Ranked make/model/trim suggestions for ?q= (typo tolerant, English or Arabic)."""
+    query = (request.args.get('q') or '').strip()[:100]
+    try:
+        limit = int(request.args.get('limit', 8))
+    except ValueError:
+        limit = 8
+    if not query:
+        return jsonify({'success': True, 'suggestions': []})
+    
+    suggestions = autocomplete.suggest(get_db(), query, limit)
+    return jsonify({'success': True, 'suggestions': suggestions})
 
 @bp.route('/my-listings', methods=['GET'])
 def get_my_listings():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = get_user_from_token(token)
+    user = require_auth()
     
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
@@ -83,9 +82,10 @@ def get_my_listings():
     db = get_db()
     # Check if owner_id exists
     try:
-        cursor = db.execute('SELECT * FROM cars WHERE owner_id = ?', (user['id'],))
-        cars = [car_row_to_dict(row) for row in cursor.fetchall()]
-        return jsonify({'success': True, 'cars': cars})
+        columns = parse_fields(request.args.get('fields'))
+        cursor = db.execute(f"SELECT {car_select_list(columns)} FROM cars WHERE owner_id = ?", (user['id'],))
+        cars = serialize_cars(cursor.fetchall())
+        return json_response({'success': True, 'cars': cars})
     except Exception:
         # Fallback if column missing (safe fail)
         return jsonify({'success': True, 'cars': []})
@@ -94,8 +94,7 @@ def get_my_listings():
 @bp.route('/my-listings/analytics', methods=['GET'])
 def get_my_listings_analytics():
     """Get analytics for user's own listings."""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    user = get_user_from_token(token)
+    user = require_auth()
     
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
@@ -105,7 +104,7 @@ def get_my_listings_analytics():
     try:
         # Get all user's listings
         cursor = db.execute('SELECT * FROM cars WHERE owner_id = ?', (user['id'],))
-        cars = [car_row_to_dict(row) for row in cursor.fetchall()]
+        cars = serialize_cars(cursor.fetchall())
         
         if not cars:
             return jsonify({
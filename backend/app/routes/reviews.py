@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from ..db import get_db
 from ..security import sanitize_string, validate_text_field, require_auth
+from ..catalog import bump_catalog_version, CARS
+from ..serializers import refresh_cards
+from ..services.taxonomy import taxonomy
 import json
 
 bp = Blueprint('reviews', __name__, url_prefix='/api/reviews')
@@ -263,4 +266,8 @@ def update_car_rating(db, car_id):
         UPDATE cars SET rating = ?, reviews = ?, updated_at = CURRENT_TIMESTAMP
         WHERE id = ?
     ''', (avg_rating, review_count, car_id))
+    refresh_cards(db, [car_id])
+    bump_catalog_version(db, CARS, ids=[car_id])
     db.commit()
+    # Ratings don't touch the taxonomy, but the version moved: keep it current in place
+    taxonomy.apply_write(db, [car_id])
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..db import get_db
 from ..security import require_auth
+from .cars import parse_fields, car_select_list
+from ..serializers import serialize_cars, json_response
 
 bp = Blueprint('watchlist', __name__, url_prefix='/api/watchlist')
 
@@ -31,27 +33,16 @@ def get_watchlist():
         print(f"Watchlist table creation note: {e}")
     
     try:
-        cursor = db.execute('''
-            SELECT c.* FROM cars c
+        columns = parse_fields(request.args.get('fields'))
+        cursor = db.execute(f'''
+            SELECT {car_select_list(columns, 'c')} FROM cars c
             INNER JOIN watchlist w ON c.id = w.car_id
             WHERE w.user_id = ?
             ORDER BY w.created_at DESC
         ''', (user['id'],))
         
-        cars = []
-        for row in cursor.fetchall():
-            car = dict(row)
-            # Parse JSON fields for any field that might contain JSON
-            for key, value in car.items():
-                if value and isinstance(value, str) and (value.startswith('[') or value.startswith('{')):
-                    try:
-                        import json
-                        car[key] = json.loads(value)
-                    except:
-                        pass  # Keep as string if not valid JSON
-            cars.append(car)
-        
-        return jsonify({'success': True, 'cars': cars})
+        cars = serialize_cars(cursor.fetchall())
+        return json_response({'success': True, 'cars': cars})
     except Exception as e:
         print(f"Get watchlist error: {e}")
         return jsonify({'success': False, 'error': 'Failed to fetch watchlist'}), 500
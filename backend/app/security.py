@@ -4,10 +4,15 @@ Provides input validation, sanitization, and rate limiting.
 """
 
 import re
+import os
 import html
+import math
 import time
+import sqlite3
+import tempfile
+import threading
 from functools import wraps
-from collections import defaultdict
+from collections import OrderedDict
 from flask import request, jsonify, g
 
 # ============================================
@@ -127,45 +132,143 @@ def sanitize_search_query(query: str) -> str:
     return sanitize_string(sanitized)
 
 # ============================================
-# Rate Limiting (Simple In-Memory)
+# Rate Limiting (Token Bucket)
 # ============================================
 
-# Store: {ip: [(timestamp, count), ...]}
-_rate_limit_store = defaultdict(list)
+# A bucket that has been idle long enough to refill completely is equivalent to
+# having no bucket at all, so idle keys can be evicted without changing behaviour.
 
-def rate_limit(max_requests: int = 10, window_seconds: int = 60):
+class MemoryRateLimitBackend:
+    """Per-process token buckets with LRU eviction of idle keys. O(1) per request."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, refill_rate: float, now: float) -> tuple[bool, float]:
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            allowed, tokens, retry_after = _take_token(tokens, updated_at, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now)  # re-insert as most recently used
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, retry_after
+
+
+class SQLiteRateLimitBackend:
+    """
+    Token buckets stored in a local SQLite file so every gunicorn worker on the
+    host shares the same limits. Idle keys are pruned periodically.
+    """
+
+    def __init__(self, path: str, idle_seconds: int = 3600, prune_every: int = 1000):
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not be shared across a fork (gunicorn workers)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_updated_at ON rate_limits(updated_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def consume(self, key: str, capacity: int, refill_rate: float, now: float) -> tuple[bool, float]:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            allowed, tokens, retry_after = _take_token(tokens, updated_at, capacity, refill_rate, now)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                conn.execute('DELETE FROM rate_limits WHERE updated_at < ?', (now - self.idle_seconds,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+
+def _take_token(tokens: float, updated_at: float, capacity: int, refill_rate: float, now: float):
+    """Refill the bucket for the elapsed time and try to take one token."""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / refill_rate
+
+
+def _create_rate_limit_backend():
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite').lower()
+    if backend == 'sqlite':
+        path = os.environ.get('RATE_LIMIT_DB_PATH', os.path.join(tempfile.gettempdir(), 'intelliwheels_rate_limits.db'))
+        return SQLiteRateLimitBackend(path)
+    return MemoryRateLimitBackend(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 10000)))
+
+
+_rate_limit_backend = _create_rate_limit_backend()
+_fallback_rate_limit_backend = MemoryRateLimitBackend()
+
+
+def get_client_ip() -> str:
+    """Client IP, honouring the first X-Forwarded-For hop set by the proxy."""
+    ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if ip:
+        ip = ip.split(',')[0].strip()
+    return ip or 'unknown'
+
+
+def rate_limit(max_requests: int = 10, window_seconds: int = 60, scope: str = None):
     """
-    Decorator to rate limit endpoints.
+    Decorator to rate limit endpoints per client IP.
     
     Args:
-        max_requests: Maximum requests allowed in the time window
-        window_seconds: Time window in seconds
+        max_requests: Maximum requests allowed in the time window (bucket capacity)
+        window_seconds: Time window in seconds over which the bucket fully refills
+        scope: Bucket namespace, defaults to the view's module-qualified name
     """
+    refill_rate = max_requests / float(window_seconds)
+
     def decorator(f):
+        bucket_scope = scope or f"{f.__module__}.{f.__qualname__}"
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Get client IP
-            ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-            if ip:
-                ip = ip.split(',')[0].strip()
+            key = f"{bucket_scope}:{get_client_ip()}"
+            now = time.time()
+            try:
+                allowed, retry_after = _rate_limit_backend.consume(key, max_requests, refill_rate, now)
+            except Exception as e:
+                # Shared store unavailable (e.g. locked); degrade to per-process limits
+                print(f"[RateLimit] Backend error, using in-memory limits: {e}")
+                allowed, retry_after = _fallback_rate_limit_backend.consume(key, max_requests, refill_rate, now)
             
-            current_time = time.time()
-            window_start = current_time - window_seconds
-            
-            # Clean old entries and count recent requests
-            _rate_limit_store[ip] = [
-                t for t in _rate_limit_store[ip] 
-                if t > window_start
-            ]
-            
-            if len(_rate_limit_store[ip]) >= max_requests:
-                return jsonify({
+            if not allowed:
+                retry_seconds = max(1, math.ceil(retry_after))
+                response = jsonify({
                     'success': False,
                     'error': 'Too many requests. Please try again later.',
-                    'retry_after': window_seconds
-                }), 429
+                    'retry_after': retry_seconds
+                })
+                response.headers['Retry-After'] = str(retry_seconds)
+                return response, 429
             
-            _rate_limit_store[ip].append(current_time)
             return f(*args, **kwargs)
         
         return decorated_function
@@ -0,0 +1,183 @@
+"""
+Car row serialization.
+
+A serializer is compiled once per column set into a tuple of
+(column index, output key, is JSON column) steps, so each row becomes a dict in
+a single pass with no intermediate dict(row) copy. JSON columns are decoded
+only when the driver hands back text (SQLite); PostgreSQL JSONB arrives
+already decoded. Each value is emitted once, under the key the frontend's
+Car type uses (src/lib/types.ts), e.g. image_url -> image.
+"""
+
+import json
+
+from flask import current_app, jsonify, request, stream_with_context
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Every column of the cars table that the API exposes
+CAR_COLUMNS = (
+    'id', 'owner_id', 'make', 'model', 'year', 'price', 'currency', 'odometer_km',
+    'image_url', 'image_urls', 'gallery_images', 'media_gallery', 'video_url',
+    'rating', 'reviews', 'description', 'specs', 'engines', 'statistics', 'source_sheets',
+    'category', 'condition', 'exterior_color', 'interior_color', 'transmission', 'fuel_type',
+    'regional_spec', 'payment_type', 'city', 'neighborhood', 'trim', 'created_at', 'updated_at',
+)
+
+JSON_COLUMNS = frozenset({
+    'specs', 'engines', 'statistics', 'gallery_images', 'media_gallery', 'image_urls', 'source_sheets',
+})
+
+# cars column -> frontend key; unlisted columns keep their name
+CANONICAL_KEYS = {
+    'image_url': 'image',
+    'image_urls': 'imageUrls',
+    'gallery_images': 'galleryImages',
+    'media_gallery': 'mediaGallery',
+    'video_url': 'videoUrl',
+    'odometer_km': 'odometerKm',
+    'exterior_color': 'exteriorColor',
+    'interior_color': 'interiorColor',
+    'fuel_type': 'fuelType',
+    'regional_spec': 'regionalSpec',
+    'payment_type': 'paymentType',
+}
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Storage-only columns never sent to clients (the generated spec columns
+# repeat values already in specs/engines)
+HIDDEN_COLUMNS = frozenset({'card_json', 'card_version', 'search_text', 'body_style', 'horsepower', 'engine'})
+
+# Columns of a listing card: what the catalog grid renders. Leaves out the heavy
+# engines/statistics/media_gallery/source_sheets blobs.
+CARD_COLUMNS = (
+    'id', 'make', 'model', 'year', 'price', 'currency', 'odometer_km', 'image_url',
+    'gallery_images', 'video_url', 'rating', 'reviews', 'description', 'specs',
+    'category', 'condition', 'transmission', 'fuel_type', 'city', 'created_at',
+)
+
+# Bump when CARD_COLUMNS or CANONICAL_KEYS change: stored cards rendered with an
+# older format are re-rendered the next time they are read.
+CARD_FORMAT_VERSION = 1
+
+_loads = orjson.loads if HAS_ORJSON else json.loads
+
+
+class CarSerializer:
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._steps = tuple(
+            (index, CANONICAL_KEYS.get(column, column), column in JSON_COLUMNS)
+            for index, column in enumerate(self.columns)
+            if column not in HIDDEN_COLUMNS
+        )
+
+    def __call__(self, row):
+        car = {}
+        for index, key, is_json in self._steps:
+            value = row[index]
+            if is_json and isinstance(value, str):
+                try:
+                    value = _loads(value) if value else None
+                except ValueError:
+                    value = None
+            car[key] = value
+        return car
+
+
+_serializers = {}
+
+
+def serializer_for(columns):
+    """Return the compiled serializer for a column tuple (cached per process)."""
+    columns = tuple(columns)
+    serializer = _serializers.get(columns)
+    if serializer is None:
+        serializer = _serializers[columns] = CarSerializer(columns)
+    return serializer
+
+
+def serialize_car(row):
+    return serializer_for(row.keys())(row)
+
+
+def serialize_cars(rows):
+    """Serialize a list of rows sharing one column set (a single query's result)."""
+    if not rows:
+        return []
+    serializer = serializer_for(rows[0].keys())
+    return [serializer(row) for row in rows]
+
+
+def dumps(payload):
+    """Encode a response payload to JSON bytes, with orjson when installed."""
+    if HAS_ORJSON:
+        # Dates go through Flask's default hook so both encoders emit the same format
+        return orjson.dumps(
+            payload,
+            default=current_app.json.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+    return current_app.json.dumps(payload).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """jsonify() replacement for large car payloads."""
+    if not HAS_ORJSON:
+        return jsonify(payload), status
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+def render_cards(db, car_ids):
+    """Render the card JSON of the given cars. Returns {car_id: card_json}."""
+    if not car_ids:
+        return {}
+    placeholders = ','.join(['?'] * len(car_ids))
+    rows = db.execute(
+        f"SELECT {', '.join(CARD_COLUMNS)} FROM cars WHERE id IN ({placeholders})", list(car_ids)
+    ).fetchall()
+    serializer = serializer_for(CARD_COLUMNS)
+    return {row['id']: dumps(serializer(row)).decode('utf-8') for row in rows}
+
+
+def store_cards(db, cards):
+    """Save rendered cards on their rows. The caller commits."""
+    for car_id, card in cards.items():
+        db.execute('UPDATE cars SET card_json = ?, card_version = ? WHERE id = ?',
+                   (card, CARD_FORMAT_VERSION, car_id))
+
+
+def refresh_cards(db, car_ids):
+    """Re-render and store cards after a write to these cars. The caller commits."""
+    store_cards(db, render_cards(db, car_ids))
+
+
+def card_list_response(fragments, total, extra=None):
+    """
+    Assemble {"success", "total", "cars"} from pre-rendered card fragments
+    without decoding them. `extra` holds further top-level keys (e.g. facets).
+    """
+    tail = ''.join(',"%s":%s' % (key, dumps(value).decode('utf-8')) for key, value in (extra or {}).items())
+    body = '{"success":true,"total":%s,"cars":[%s]%s}' % (
+        'null' if total is None else int(total), ','.join(fragments), tail
+    )
+    return current_app.response_class(body, mimetype='application/json')
+
+
+def wants_ndjson():
+    """True when the client asked for newline-delimited JSON (Accept header or ?stream=1)."""
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(chunks, headers=None):
+    """Stream an iterable of NDJSON chunks (bytes/str, each ending in a newline)."""
+    return current_app.response_class(
+        stream_with_context(chunks), mimetype=NDJSON_MIMETYPE, headers=headers
+    )
@@ -0,0 +1,160 @@
+"""
+Stateless access tokens for AUTH_TOKEN_MODE=signed.
+
+An access token is base64url(claims).base64url(HMAC-SHA256(SECRET_KEY)) and is
+verified without a database round trip. Tokens are short-lived; the session
+token issued alongside acts as the refresh token, and each access token names
+it by a one-way `sid` so logout can end it. Logout revokes a token's jti,
+which every worker learns about through a compact, periodically synced set.
+
+Signed mode needs a client that stores the refresh token and calls
+POST /api/auth/refresh before ACCESS_TOKEN_TTL runs out. The bundled frontend
+(src/lib/api.ts, AuthContext) does neither yet: enabling the mode with it logs
+every user out after ACCESS_TOKEN_TTL seconds.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+AUTH_TOKEN_MODE = os.environ.get('AUTH_TOKEN_MODE', 'session').lower()
+ACCESS_TOKEN_TTL = int(os.environ.get('ACCESS_TOKEN_TTL', 900))
+REVOCATION_SYNC_SECONDS = int(os.environ.get('REVOCATION_SYNC_SECONDS', 30))
+
+# Signed tokens are much longer than session tokens; anything past this is junk
+MAX_ACCESS_TOKEN_LENGTH = 1024
+
+
+def signed_tokens_enabled():
+    return AUTH_TOKEN_MODE == 'signed'
+
+
+def is_access_token(token):
+    """Session tokens are plain urlsafe strings; access tokens have a '.' separated signature."""
+    return bool(token) and '.' in token
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+def _signature(payload, secret):
+    return _b64encode(hmac.new(secret.encode('utf-8'), payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def session_id(session_token):
+    """Public identifier of a refresh (session) token; the token can't be recovered from it."""
+    return hashlib.sha256(session_token.encode('utf-8')).hexdigest()[:32]
+
+
+def issue_access_token(user, secret, session_token, ttl=ACCESS_TOKEN_TTL):
+    """Return (token, expires_at_epoch) for a user dict, tied to the refresh session it came from."""
+    expires_at = int(time.time()) + ttl
+    created_at = user.get('created_at')
+    claims = {
+        'uid': user['id'],
+        'username': user['username'],
+        'email': user['email'],
+        'role': user.get('role') or 'user',
+        'created_at': str(created_at) if created_at is not None else None,
+        'exp': expires_at,
+        'jti': secrets.token_urlsafe(12),
+        'sid': session_id(session_token),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{_signature(payload, secret)}", expires_at
+
+
+def decode_access_token(token, secret):
+    """Return the claims of a well-signed, unexpired token, else None. Does not check revocation."""
+    if not token or len(token) > MAX_ACCESS_TOKEN_LENGTH or token.count('.') != 1:
+        return None
+    payload, signature = token.split('.')
+    if not hmac.compare_digest(signature, _signature(payload, secret)):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+def user_from_claims(claims):
+    return {
+        'id': claims['uid'],
+        'username': claims['username'],
+        'email': claims['email'],
+        'role': claims['role'],
+        'created_at': claims.get('created_at'),
+    }
+
+
+class RevocationList:
+    """
+    jti -> expiry of revoked, not yet expired access tokens.
+    Each worker keeps a local copy and reloads it from revoked_tokens every
+    `sync_seconds`, so a logout in one worker is honoured everywhere within that window.
+    """
+
+    def __init__(self, sync_seconds=REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._revoked = {}
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti):
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def remember(self, jti, expires_at):
+        """Treat jti as revoked in this worker until expires_at (revoked elsewhere, see auth)."""
+        self._revoked[jti] = expires_at
+
+    def revoke(self, db, jti, expires_at):
+        self.remember(jti, expires_at)
+        db.execute('DELETE FROM revoked_tokens WHERE jti = ?', (jti,))
+        db.execute(
+            'INSERT INTO revoked_tokens (jti, expires_at) VALUES (?, ?)',
+            (jti, datetime.utcfromtimestamp(expires_at))
+        )
+
+    def needs_sync(self):
+        return time.monotonic() - self._synced_at >= self.sync_seconds
+
+    def sync(self, db):
+        with self._lock:
+            if not self.needs_sync():
+                return
+            rows = db.execute(
+                'SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > CURRENT_TIMESTAMP'
+            ).fetchall()
+            revoked = {}
+            for row in rows:
+                expires_at = row['expires_at']
+                if not isinstance(expires_at, datetime):
+                    expires_at = datetime.fromisoformat(str(expires_at))
+                revoked[row['jti']] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+            self._revoked = revoked
+            self._synced_at = time.monotonic()
+
+    @staticmethod
+    def purge(db):
+        """Delete revocations whose tokens have expired anyway. Returns rows deleted."""
+        cursor = db.execute('DELETE FROM revoked_tokens WHERE expires_at < CURRENT_TIMESTAMP')
+        db.commit()
+        return cursor.rowcount or 0
+
+
+revocation_list = RevocationList()
@@ -3,6 +3,9 @@ import json
 import joblib
 import base64
 from flask import current_app
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, UpstreamTimeoutError
+from .catalog_index import catalog_index
+from .text_normalization import ARABIC_FOLDING, normalize_text, normalize_query
 
 try:
     import google.generativeai as genai
@@ -11,6 +14,25 @@ except ImportError:
     GEMINI_AVAILABLE = False
     genai = None
 
+
+def is_arabic(text):
+    """Detect if text is predominantly Arabic."""
+    if not text:
+        return False
+    arabic_chars = sum(1 for c in text if '\u0600' <= c <= '\u06FF' or '\u0750' <= c <= '\u077F')
+    return arabic_chars > len(text) * 0.3
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for prompt budgeting."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _is_safety_block(exc):
+    error_lower = str(exc).lower()
+    return 'blocked' in error_lower or 'safety' in error_lower
+
+
 class AIService:
     _instance = None
     
@@ -30,6 +52,17 @@ class AIService:
         self.gemini_model = None
         self.active_model_name = None
         self._init_error = None
+        # Retrieval settings: how many listings to inject and the overall prompt budget
+        self.retrieval_top_k = int(os.environ.get('AI_RETRIEVAL_TOP_K', 5))
+        self.prompt_token_budget = int(os.environ.get('AI_PROMPT_TOKEN_BUDGET', 1500))
+        # Upstream calls go through a breaker so outages fail fast to local fallbacks
+        self.breaker = CircuitBreaker(
+            'gemini',
+            failure_threshold=int(os.environ.get('AI_BREAKER_FAILURES', 3)),
+            reset_timeout=float(os.environ.get('AI_BREAKER_RESET_SECONDS', 30)),
+            call_timeout=float(os.environ.get('AI_TIMEOUT_SECONDS', 15)),
+            ignore_exception=_is_safety_block,
+        )
         self._init_gemini()
         
     def _init_gemini(self):
@@ -206,6 +239,128 @@ class AIService:
             'currency': 'JOD'
         }
 
+    def _use_arabic(self, text, history):
+        """Check the message and the last few history turns for Arabic."""
+        if is_arabic(text):
+            return True
+        for h in (history or [])[-3:]:
+            if isinstance(h, dict) and is_arabic(h.get('text', '')):
+                return True
+        return False
+
+    def _generate(self, parts):
+        """Call Gemini through the circuit breaker (bounded by AI_TIMEOUT_SECONDS)."""
+        return self.breaker.call(self.gemini_model.generate_content, parts)
+
+    def _retrieve(self, text, history=None, limit=None):
+        """Top matching catalog records for the message, falling back to recent user turns."""
+        from ..db import get_db
+        try:
+            catalog_index.ensure_fresh(get_db())
+        except Exception as e:
+            print(f"[Catalog Index] Build failed: {e}")
+            return []
+        limit = limit or self.retrieval_top_k
+        matches = catalog_index.search(text, limit)
+        if not matches and history:
+            # Follow-ups like "how much is it?" refer back to earlier turns
+            recent = ' '.join(h.get('text', '') for h in history[-3:] if isinstance(h, dict) and h.get('role') == 'user')
+            matches = catalog_index.search(recent, limit)
+        return matches
+
+    def _build_catalog_context(self, text, history=None):
+        """Compact catalog facts (matching listings + price aggregates) for the system prompt."""
+        matches = self._retrieve(text, history)
+        if not matches:
+            return ''
+
+        lines = []
+        for car in matches:
+            year = f" {car['year']}" if car.get('year') else ''
+            body = f" {car['body_style']}" if car.get('body_style') else ''
+            price = f"{car['price']:,.0f} {car['currency']}" if car.get('price') else 'no price'
+            lines.append(f"- #{car['id']}{year} {car['make']} {car['model']}{body}: {price}")
+
+        seen = set()
+        for car in matches:
+            key = (car['make'], car['model'])
+            if key in seen:
+                continue
+            seen.add(key)
+            stats = catalog_index.model_stats(*key)
+            if stats:
+                lines.append(
+                    f"- {key[0]} {key[1]} market: {stats['count']} listings, "
+                    f"{stats['min']:,.0f}-{stats['max']:,.0f} JOD (avg {stats['avg']:,.0f})"
+                )
+        return "\n".join(lines)
+
+    def _trim_history(self, history, token_budget, max_turns=5):
+        """Keep the most recent turns that fit the token budget (oldest dropped first)."""
+        kept = []
+        used = 0
+        for h in reversed((history or [])[-max_turns:]):
+            if not isinstance(h, dict):
+                continue
+            line = f"{'User' if h.get('role') == 'user' else 'Assistant'}: {h.get('text', '')}"
+            cost = estimate_tokens(line)
+            if used + cost > token_budget:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
+
+    def _catalog_fallback_text(self, text, use_arabic=False, history=None):
+        """Build a local, catalog-backed answer when the upstream model is unavailable."""
+        matches = self._retrieve(text, history, limit=3) if text else []
+        lines = []
+        if use_arabic:
+            lines.append("المساعد الذكي مشغول حالياً، إليك ما وجدته في كتالوج إنتلي ويلز:")
+        else:
+            lines.append("The AI assistant is busy right now, so here is what I found in the IntelliWheels catalog:")
+
+        for car in matches:
+            year = f" {car['year']}" if car.get('year') else ''
+            price = f"{car['price']:,.0f} {car['currency']}" if car.get('price') else 'price on request'
+            lines.append(f"- {car['make']} {car['model']}{year}: {price}")
+
+        if matches:
+            top = matches[0]
+            estimate = self.estimate_price(top['make'], top['model'], top['year'], {'bodyStyle': top.get('body_style')})
+            if use_arabic:
+                lines.append(f"السعر العادل التقديري لـ {top['make']} {top['model']}: {estimate['low']:,} - {estimate['high']:,} دينار")
+            else:
+                lines.append(f"Estimated fair price for a {top['make']} {top['model']}: {estimate['low']:,} - {estimate['high']:,} JOD")
+        elif use_arabic:
+            lines.append("لم أجد سيارات مطابقة. جرّب البحث باسم الشركة أو الموديل.")
+        else:
+            lines.append("No matching cars found. Try searching by make or model.")
+
+        return "\n".join(lines)
+
+    def _vision_fallback(self):
+        """Image analysis has no local equivalent; answer immediately so the form stays usable."""
+        return {
+            "make": "",
+            "model": "",
+            "year": None,
+            "bodyStyle": "",
+            "estimatedPrice": None,
+            "conditionDescription": "AI image analysis is temporarily unavailable. Please enter the car details manually.",
+            "error": True,
+            "fallback": True
+        }
+
+    def _listing_fallback(self, query, history):
+        """Catalog-backed pricing hints for the listing assistant while Gemini is unavailable."""
+        return {
+            "success": True,
+            "response": self._catalog_fallback_text(query, self._use_arabic(query, history), history),
+            "action_type": None,
+            "listing_data": None,
+            "fallback": True
+        }
+
     def chat(self, message, history, image_base64=None):
         if not self.gemini_model:
             # Re-attempt initialization in case env was loaded after service init
@@ -217,22 +372,12 @@ class AIService:
                 return {'text': f"AI service error: Your Gemini API key is invalid. Please update it in the Render dashboard with a valid key from https://aistudio.google.com/app/apikey"}
             return {'text': f"I am the IntelliWheels AI Assistant. The AI service is currently unavailable. Error: {error}"}
 
+        if self.breaker.is_open():
+            return {'text': self._catalog_fallback_text(message, self._use_arabic(message, history), history), 'fallback': True}
+
         try:
-            # Detect if message is in Arabic
-            def is_arabic(text):
-                if not text:
-                    return False
-                arabic_chars = sum(1 for c in text if '\u0600' <= c <= '\u06FF' or '\u0750' <= c <= '\u077F')
-                return arabic_chars > len(text) * 0.3
-            
-            use_arabic = is_arabic(message) if message else False
-            
-            # Check history for Arabic as well
-            if not use_arabic and history:
-                for h in history[-3:]:
-                    if is_arabic(h.get('text', '')):
-                        use_arabic = True
-                        break
+            # Detect if message (or recent history) is in Arabic
+            use_arabic = self._use_arabic(message, history)
             
             # Build conversation context
             if use_arabic:
@@ -258,12 +403,6 @@ class AIService:
 }
 ```
 
-مرجع أسعار السيارات المستعملة في الأردن:
-- اقتصادية (تويوتا ياريس، هوندا سيتي): 5,000 - 12,000 دينار
-- متوسطة (تويوتا كامري، هوندا أكورد): 8,000 - 20,000 دينار
-- فاخرة (BMW 3، مرسيدس C-Class): 15,000 - 35,000 دينار
-- فخمة (BMW 7، مرسيدس S-Class): 30,000 - 80,000 دينار
-
 كن مفيداً وموجزاً وعلى دراية بالسيارات. أجب دائماً باللغة العربية."""
             else:
                 system_prompt = """You are IntelliWheels AI Assistant, an expert automotive consultant for a car marketplace in Jordan. 
@@ -288,21 +427,22 @@ If the user wants to list/sell a car, or provides car details (image, price, des
 }
 ```
 
-Price references for used cars in Jordan:
-- Economy (Toyota Yaris, Honda City): 5,000 - 12,000 JOD
-- Mid-range (Toyota Camry, Honda Accord): 8,000 - 20,000 JOD  
-- Premium (BMW 3-Series, Mercedes C-Class): 15,000 - 35,000 JOD
-- Luxury (BMW 7-Series, Mercedes S-Class): 30,000 - 80,000 JOD
-
 Be helpful, concise, and knowledgeable about cars."""
 
+            # Inject only the catalog facts relevant to this message
+            catalog_context = self._build_catalog_context(message, history)
+            if catalog_context:
+                header = "بيانات من الكتالوج الحالي (استخدمها للأسعار والتوفر):" if use_arabic else "Live catalog facts (use these for prices and availability):"
+                system_prompt = f"{system_prompt}\n\n{header}\n{catalog_context}"
+
             # Build message content
             contents = []
             
-            # Add history context
-            if history:
-                history_text = "\\n".join([f"{'User' if h.get('role') == 'user' else 'Assistant'}: {h.get('text', '')}" for h in history[-5:]])
-                contents.append(f"Previous conversation:\\n{history_text}\\n\\n")
+            # Add history context, trimmed to what is left of the token budget
+            remaining = self.prompt_token_budget - estimate_tokens(system_prompt) - estimate_tokens(message)
+            history_text = self._trim_history(history, remaining)
+            if history_text:
+                contents.append(f"Previous conversation:\n{history_text}\n\n")
             
             # Add current message
             if message:
@@ -323,26 +463,28 @@ Be helpful, concise, and knowledgeable about cars."""
                     
                     prompt_parts = [system_prompt]
                     if contents:
-                        prompt_parts.append("\\n".join(contents))
+                        prompt_parts.append("\n".join(contents))
                     if not message:
                         prompt_parts.append("Please analyze this car image and provide details about the vehicle:")
                     prompt_parts.append(image_part)
                     
-                    response_obj = self.gemini_model.generate_content(prompt_parts)
+                    response_obj = self._generate(prompt_parts)
+                except (CircuitOpenError, UpstreamTimeoutError):
+                    raise
                 except Exception as e:
                     print(f"Image processing error: {e}")
                     # Fall back to text-only if image fails
                     if message:
-                        response_obj = self.gemini_model.generate_content([
+                        response_obj = self._generate([
                             system_prompt,
-                            "\\n".join(contents)
+                            "\n".join(contents)
                         ])
                     else:
                         return {'text': f"I couldn't process that image. Error: {str(e)[:100]}"}
             else:
-                response_obj = self.gemini_model.generate_content([
+                response_obj = self._generate([
                     system_prompt,
-                    "\\n".join(contents)
+                    "\n".join(contents)
                 ])
             
             # Parse response for listing intent
@@ -366,6 +508,9 @@ Be helpful, concise, and knowledgeable about cars."""
                 'listing_data': listing_data
             }
             
+        except (CircuitOpenError, UpstreamTimeoutError) as e:
+            print(f"Gemini unavailable, serving catalog fallback: {e}")
+            return {'text': self._catalog_fallback_text(message, self._use_arabic(message, history), history), 'fallback': True}
         except Exception as e:
             error_msg = str(e)
             print(f"Gemini API error: {error_msg}")
@@ -376,7 +521,7 @@ Be helpful, concise, and knowledgeable about cars."""
             elif 'blocked' in error_lower or 'safety' in error_lower:
                 return {'text': "I cannot process that request. Please rephrase your question."}
             elif 'quota' in error_lower or 'resource' in error_lower:
-                return {'text': "AI service temporarily unavailable. Please try again in a few minutes."}
+                return {'text': self._catalog_fallback_text(message, self._use_arabic(message, history), history), 'fallback': True}
             return {'text': f"I encountered an issue: {error_msg[:150]}"}
 
     def semantic_search(self, query, limit):
@@ -389,14 +534,30 @@ Be helpful, concise, and knowledgeable about cars."""
             print(f"[Semantic Search] Using shared DB connection")
             
             # Get ALL cars from database to score them
-            cursor = db.execute("SELECT id, make, model, year, price, currency, image_url, specs FROM cars")
+            # body_style / horsepower / engine are generated columns: no JSON parsing to match them
+            cursor = db.execute(
+                "SELECT id, make, model, year, price, currency, image_url, specs, fuel_type, body_style, horsepower, engine FROM cars"
+            )
             all_cars = cursor.fetchall()
             print(f"[Semantic Search] Total cars in DB: {len(all_cars)}")
             
             if not all_cars:
                 return []
             
-            query_lower = query.lower()
+            # Folded so Arabic-Indic digits parse as prices
+            query_lower = query.lower().translate(ARABIC_FOLDING)
+            
+            # Horsepower constraints ("over 300hp", "under 200 hp"), removed before
+            # price parsing so "over 300hp" isn't read as a 300k minimum price
+            min_hp = None
+            max_hp = None
+            hp_pattern = r'(?:(under|below|less than|max|<|over|above|more than|min|>)\s*)?(\d+)\s*(?:hp|bhp|horsepower)\b'
+            for hp_match in re.finditer(hp_pattern, query_lower):
+                if hp_match.group(1) in ('under', 'below', 'less than', 'max', '<'):
+                    max_hp = int(hp_match.group(2))
+                else:
+                    min_hp = int(hp_match.group(2))
+            query_lower = re.sub(hp_pattern, ' ', query_lower)
             
             # Parse price constraints from query (e.g., "under 50k", "below 100000")
             max_price = None
@@ -416,10 +577,11 @@ Be helpful, concise, and knowledgeable about cars."""
             # Extract keywords, removing price-related and stop words
             clean_query = re.sub(r'(?:under|below|less than|over|above|more than|max|min|<|>)\s*\d+\s*k?', '', query_lower)
             stop_words = {'car', 'cars', 'the', 'a', 'an', 'and', 'or', 'with', 'for', 'find', 'show', 'me', 'i', 'want', 'need', 'looking', 'search'}
-            keywords = [w.strip() for w in clean_query.split() if len(w.strip()) > 1 and w.strip() not in stop_words]
+            # Same normalization as the catalog search: Arabic make/model names become English keywords
+            keywords = [w for w in normalize_query(clean_query).split() if len(w) > 1 and w not in stop_words]
             
             # Define category mappings
-            luxury_makes = {'mercedes', 'bmw', 'audi', 'lexus', 'porsche', 'bentley', 'rolls-royce', 'maserati', 'jaguar', 'land rover', 'range rover', 'infiniti', 'cadillac', 'lincoln'}
+            luxury_makes = {'mercedes', 'mercedes benz', 'bmw', 'audi', 'lexus', 'porsche', 'bentley', 'rolls royce', 'maserati', 'jaguar', 'land rover', 'range rover', 'infiniti', 'cadillac', 'lincoln'}
             economy_makes = {'toyota', 'honda', 'nissan', 'hyundai', 'kia', 'mazda', 'suzuki', 'mitsubishi', 'subaru'}
             fuel_keywords = {'petrol': ['petrol', 'gasoline', 'gas'], 'diesel': ['diesel'], 'hybrid': ['hybrid'], 'electric': ['electric', 'ev', 'battery']}
             body_keywords = {'suv': ['suv', 'crossover', '4x4'], 'sedan': ['sedan', 'saloon'], 'coupe': ['coupe', 'sports'], 'hatchback': ['hatchback', 'hatch'], 'truck': ['truck', 'pickup'], 'van': ['van', 'minivan']}
@@ -428,18 +590,15 @@ Be helpful, concise, and knowledgeable about cars."""
             scored_cars = []
             for row in all_cars:
                 score = 0.0
-                car_make = (row['make'] or '').lower()
-                car_model = (row['model'] or '').lower()
+                car_make = normalize_text(row['make'])
+                car_model = normalize_text(row['model'])
                 car_year = row['year'] or 0
                 car_price = row['price'] or 0
                 car_specs_raw = row['specs'] or ''
-                
-                # Parse specs JSON
-                try:
-                    car_specs = json.loads(car_specs_raw) if car_specs_raw else {}
-                except:
-                    car_specs = {}
-                car_specs_text = json.dumps(car_specs).lower() if car_specs else ''
+                car_specs_text = (car_specs_raw if isinstance(car_specs_raw, str) else json.dumps(car_specs_raw)).lower()
+                car_body = row['body_style'] or ''
+                car_hp = row['horsepower']
+                car_fuel = f"{row['fuel_type'] or ''} {row['engine'] or ''}".lower()
                 
                 # Combined searchable text
                 searchable = f"{car_make} {car_model} {car_specs_text}"
@@ -470,12 +629,12 @@ Be helpful, concise, and knowledgeable about cars."""
                     
                     # Fuel type matches
                     for fuel, terms in fuel_keywords.items():
-                        if keyword in terms and fuel in searchable:
+                        if keyword in terms and fuel in car_fuel:
                             score += 20
                     
                     # Body type matches
                     for body, terms in body_keywords.items():
-                        if keyword in terms and body in searchable:
+                        if keyword in terms and body in car_body:
                             score += 20
                 
                 # Price range scoring (bonus for matching price constraints)
@@ -493,6 +652,13 @@ Be helpful, concise, and knowledgeable about cars."""
                     else:
                         score -= 15  # Penalty for under minimum
                 
+                # Horsepower constraints
+                if min_hp or max_hp:
+                    if car_hp and (not min_hp or car_hp >= min_hp) and (not max_hp or car_hp <= max_hp):
+                        score += 20
+                    else:
+                        score -= 20
+                
                 # If no keywords matched at all, give a small base score based on recency
                 if score == 0 and not keywords:
                     # No specific search terms, rank by year (newer = better)
@@ -568,6 +734,9 @@ Be helpful, concise, and knowledgeable about cars."""
                 "error": True
             }
 
+        if self.breaker.is_open():
+            return self._vision_fallback()
+
         try:
             # Remove data URL prefix if present
             if ',' in image_base64:
@@ -601,7 +770,7 @@ PRICE GUIDE for used cars in Jordan (JOD):
 
 Only respond with the JSON, no other text."""
 
-            response = self.gemini_model.generate_content([prompt, image_part])
+            response = self._generate([prompt, image_part])
             
             # Parse JSON from response
             response_text = response.text.strip()
@@ -627,6 +796,9 @@ Only respond with the JSON, no other text."""
                 "conditionDescription": "Could not parse AI response. Please try a clearer image.",
                 "error": True
             }
+        except (CircuitOpenError, UpstreamTimeoutError) as e:
+            print(f"Gemini unavailable for image analysis: {e}")
+            return self._vision_fallback()
         except Exception as e:
             print(f"Image analysis error: {e}")
             error_msg = str(e)
@@ -662,22 +834,12 @@ Only respond with the JSON, no other text."""
                 "listing_data": None
             }
 
+        if self.breaker.is_open():
+            return self._listing_fallback(query, history)
+
         try:
-            # Detect if query is in Arabic
-            def is_arabic(text):
-                if not text:
-                    return False
-                arabic_chars = sum(1 for c in text if '\u0600' <= c <= '\u06FF' or '\u0750' <= c <= '\u077F')
-                return arabic_chars > len(text) * 0.3
-            
-            use_arabic = is_arabic(query) if query else False
-            
-            # Check history for Arabic as well
-            if not use_arabic and history:
-                for h in history[-3:]:
-                    if is_arabic(h.get('text', '')):
-                        use_arabic = True
-                        break
+            # Detect if query (or recent history) is in Arabic
+            use_arabic = self._use_arabic(query, history)
             
             if use_arabic:
                 system_prompt = """أنت مساعد إعلانات السيارات لسوق إنتلي ويلز في الأردن. ساعد المستخدمين في إنشاء إعلانات السيارات.
@@ -722,7 +884,7 @@ If you need more information, just respond normally without the listing_data."""
             if history:
                 history_text = "\n".join([f"{'User' if h.get('role') == 'user' else 'Assistant'}: {h.get('text', '')}" for h in history[-5:]])
             
-            response = self.gemini_model.generate_content([
+            response = self._generate([
                 system_prompt,
                 f"Conversation history:\n{history_text}\n\nUser: {query}"
             ])
@@ -751,6 +913,9 @@ If you need more information, just respond normally without the listing_data."""
                     "listing_data": None
                 }
                 
+        except (CircuitOpenError, UpstreamTimeoutError) as e:
+            print(f"Gemini unavailable for listing assistant: {e}")
+            return self._listing_fallback(query, history)
         except Exception as e:
             print(f"Listing assistant error: {e}")
             error_msg = str(e)
@@ -0,0 +1,163 @@
+"""
+Typo-tolerant autocomplete over makes, models and trims.
+
+The index is derived from the taxonomy (rebuilt whenever the taxonomy
+changes) and has two parts:
+  - a prefix trie whose nodes hold their best suggestions, so a prefix
+    lookup is one walk down the trie;
+  - a trigram index over the same keys, consulted only when the prefix walk
+    comes back short. Trigrams narrow the keys to a handful of candidates,
+    which are then checked with a bounded prefix edit distance
+    ("mercedz" -> "mercedes", "lnad cru" -> "land cruiser").
+Every name is indexed under its normalized English form and its known Arabic
+spellings, so "تويوتا لاند" completes to Toyota Land Cruiser.
+"""
+
+import time
+
+from .taxonomy import taxonomy
+from .text_normalization import normalize_text, arabic_aliases
+
+TRIE_NODE_LIMIT = 20
+MAX_SUGGESTIONS = 20
+FUZZY_CANDIDATES = 50
+
+# Makes rank before models before trims at equal match quality
+KIND_ORDER = {'make': 0, 'model': 1, 'trim': 2}
+
+
+def _trigrams(key):
+    padded = '  ' + key
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_distance(query):
+    if len(query) < 3:
+        return 0
+    return 1 if len(query) <= 5 else 2
+
+
+def prefix_distance(query, key, limit):
+    """Smallest edit distance between query and any prefix of key, or None if above limit."""
+    previous = list(range(len(key) + 1))
+    for i, qc in enumerate(query, 1):
+        current = [i] + [0] * len(key)
+        for j, kc in enumerate(key, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (qc != kc))
+        if min(current) > limit:
+            return None
+        previous = current
+    best = min(previous)
+    return best if best <= limit else None
+
+
+def _keys_for(name, parent_keys=()):
+    """Index keys for a name: itself, its Arabic spellings, each qualified by its parents' keys."""
+    own = [normalize_text(name)]
+    own += arabic_aliases(own[0])
+    keys = set(own)
+    for parent in parent_keys:
+        keys.update(f"{parent} {key}" for key in own)
+    # Later words of multi-word names ("cruiser" for "land cruiser")
+    words = own[0].split()
+    keys.update(' '.join(words[i:]) for i in range(1, len(words)))
+    return keys
+
+
+class AutocompleteIndex:
+    def __init__(self, suggestions):
+        started = time.monotonic()
+        # suggestions: list of (suggestion dict, keys); ids are list positions,
+        # already in rank order so per-node lists only need truncating
+        suggestions.sort(key=lambda item: (KIND_ORDER[item[0]['type']], -item[0]['count'], item[0]['label']))
+        self.suggestions = [suggestion for suggestion, _ in suggestions]
+        self._trie = {}
+        self._keys = {}
+        self._grams = {}
+
+        for suggestion_id, (_, keys) in enumerate(suggestions):
+            for key in keys:
+                if not key:
+                    continue
+                self._keys.setdefault(key, []).append(suggestion_id)
+                node = self._trie
+                for ch in key:
+                    node = node.setdefault(ch, {'': []})
+                    hits = node['']
+                    if len(hits) < TRIE_NODE_LIMIT and (not hits or hits[-1] != suggestion_id):
+                        hits.append(suggestion_id)
+
+        for key in self._keys:
+            for gram in _trigrams(key):
+                self._grams.setdefault(gram, []).append(key)
+        print(f"[Autocomplete] Indexed {len(self.suggestions)} names under {len(self._keys)} keys "
+              f"in {(time.monotonic() - started) * 1000:.0f}ms")
+
+    def _prefix(self, query):
+        node = self._trie
+        for ch in query:
+            node = node.get(ch)
+            if node is None:
+                return []
+        return node['']
+
+    def _fuzzy(self, query):
+        """{suggestion id: edit distance} for keys within the query's typo budget."""
+        limit = _max_distance(query)
+        if not limit:
+            return {}
+        grams = _trigrams(query)
+        # An edit changes at most 3 trigrams of the query
+        needed = max(1, len(grams) - 3 * limit)
+        shared = {}
+        for gram in grams:
+            for key in self._grams.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        candidates = sorted((key for key, count in shared.items() if count >= needed),
+                            key=lambda key: -shared[key])[:FUZZY_CANDIDATES]
+        distances = {}
+        for key in candidates:
+            distance = prefix_distance(query, key, limit)
+            if distance is None:
+                continue
+            for suggestion_id in self._keys[key]:
+                if distance < distances.get(suggestion_id, limit + 1):
+                    distances[suggestion_id] = distance
+        return distances
+
+    def suggest(self, text, limit=10):
+        query = normalize_text(text)
+        if not query:
+            return []
+        ranked = list(self._prefix(query)[:limit])
+        if len(ranked) < limit:
+            seen = set(ranked)
+            fuzzy = self._fuzzy(query)
+            ranked += sorted((sid for sid in fuzzy if sid not in seen),
+                             key=lambda sid: (fuzzy[sid], sid))[:limit - len(ranked)]
+        return [self.suggestions[suggestion_id] for suggestion_id in ranked]
+
+
+def _build_index():
+    suggestions = []
+    makes = {}
+    for make, model, node in taxonomy.model_nodes():
+        makes[make] = makes.get(make, 0) + node['cars']
+        make_keys = _keys_for(make)
+        model_keys = _keys_for(model, make_keys)
+        suggestions.append(({'type': 'model', 'label': f"{make} {model}", 'make': make,
+                             'model': model, 'count': node['cars']}, model_keys))
+        for trim, count in node['trims'].items():
+            suggestions.append(({'type': 'trim', 'label': f"{make} {model} {trim}", 'make': make,
+                                 'model': model, 'trim': trim, 'count': count},
+                                _keys_for(trim, model_keys)))
+    for make, count in makes.items():
+        suggestions.append(({'type': 'make', 'label': make, 'make': make, 'count': count}, _keys_for(make)))
+    return AutocompleteIndex(suggestions)
+
+
+def suggest(db, text, limit=10):
+    """Ranked make/model/trim suggestions for a partial, possibly misspelled query."""
+    taxonomy.ensure_current(db)
+    index = taxonomy.view('autocomplete', _build_index)
+    return index.suggest(text, max(1, min(limit, MAX_SUGGESTIONS)))
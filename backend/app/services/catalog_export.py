@@ -0,0 +1,267 @@
+"""
+Bulk catalog export (CSV, NDJSON, Parquet).
+
+Rows are read in batches through iter_row_batches (server-side cursor on
+PostgreSQL, fetchmany on SQLite) and written out batch by batch, so memory
+stays constant whatever the catalog size. Exports requested over the API run
+as jobs in a child process started by a forkserver (spawn where that is
+unavailable), off the request workers; job state lives in small JSON files
+next to the output so every worker on the host can see it.
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import socket
+import tempfile
+import time
+from datetime import datetime
+
+from flask import Flask
+
+from ..db import get_db, close_db, iter_row_batches
+from ..serializers import CAR_COLUMNS, JSON_COLUMNS, NDJSON_MIMETYPE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'intelliwheels_exports'))
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MAX_RUNNING = int(os.environ.get('EXPORT_MAX_RUNNING', 2))
+EXPORT_RETENTION_SECONDS = int(os.environ.get('EXPORT_RETENTION_SECONDS', 24 * 3600))
+# A queued job whose process never reported in by then is treated as lost
+EXPORT_START_TIMEOUT = 60
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': (NDJSON_MIMETYPE, 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+INTEGER_COLUMNS = {'id', 'owner_id', 'year', 'odometer_km', 'reviews'}
+FLOAT_COLUMNS = {'price', 'rating'}
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+class ExportError(Exception):
+    """Raised for an export request that cannot be run."""
+
+
+class ExportBusy(ExportError):
+    """Raised when EXPORT_MAX_RUNNING jobs are already running on this host."""
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or HAS_PYARROW]
+
+
+def _flat_value(column, value):
+    """Scalar form of a value for CSV/Parquet: JSON columns as JSON text, timestamps as strings."""
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _decoded_value(column, value):
+    if column in JSON_COLUMNS and isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _parquet_schema():
+    def column_type(column):
+        if column in INTEGER_COLUMNS:
+            return pa.int64()
+        if column in FLOAT_COLUMNS:
+            return pa.float64()
+        return pa.string()
+    return pa.schema([(column, column_type(column)) for column in CAR_COLUMNS])
+
+
+def write_export(db, path, fmt, where_sql='', params=(), order=None):
+    """Write every cars row matching where_sql to path in the given format (default order: id). Returns the row count."""
+    if fmt not in available_formats():
+        raise ExportError(f"Unsupported export format: {fmt}")
+
+    sql = f"SELECT {', '.join(CAR_COLUMNS)} FROM cars WHERE 1=1 {where_sql} {order or 'ORDER BY id'}"
+    batches = iter_row_batches(db, sql, list(params), EXPORT_BATCH_SIZE)
+    count = 0
+
+    if fmt == 'parquet':
+        with pq.ParquetWriter(path, _parquet_schema()) as writer:
+            for rows in batches:
+                columns = {
+                    column: [_flat_value(column, row[index]) for row in rows]
+                    for index, column in enumerate(CAR_COLUMNS)
+                }
+                writer.write_table(pa.table(columns, schema=writer.schema))
+                count += len(rows)
+        return count
+
+    with io.open(path, 'w', encoding='utf-8', newline='') as out:
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            writer.writerow(CAR_COLUMNS)
+            for rows in batches:
+                writer.writerows(
+                    [_flat_value(column, row[index]) for index, column in enumerate(CAR_COLUMNS)]
+                    for row in rows
+                )
+                count += len(rows)
+        else:
+            for rows in batches:
+                out.writelines(
+                    json.dumps({column: _decoded_value(column, row[index])
+                                for index, column in enumerate(CAR_COLUMNS)}, ensure_ascii=False) + '\n'
+                    for row in rows
+                )
+                count += len(rows)
+    return count
+
+
+# ============================================
+# Export jobs
+# ============================================
+
+def _status_path(job_id):
+    return os.path.join(EXPORT_DIR, f"{job_id}.json")
+
+
+def export_file_path(job):
+    return os.path.join(EXPORT_DIR, f"{job['id']}.{EXPORT_FORMATS[job['format']][1]}")
+
+
+def _save_job(job):
+    # Write-then-rename so readers in other workers never see a partial file
+    tmp_path = _status_path(job['id']) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, _status_path(job['id']))
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        # A killed child its parent hasn't reaped still answers kill(0); Linux lists it as a zombie
+        with open(f"/proc/{pid}/stat", encoding='utf-8') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def _check_alive(job):
+    """Mark a queued/running job whose process is gone (killed, OOM, worker restart) as failed."""
+    if job.get('status') not in ('queued', 'running'):
+        return job
+    pid = job.get('pid')
+    if pid is not None:
+        lost = job.get('host') == socket.gethostname() and not _process_alive(pid)
+    else:
+        lost = time.time() - job.get('created_at', 0) > EXPORT_START_TIMEOUT
+    if lost:
+        job.update(status='failed', error='Export process stopped unexpectedly', finished_at=time.time())
+        _save_job(job)
+    return job
+
+
+def load_job(job_id):
+    if not job_id or not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(_status_path(job_id), encoding='utf-8') as f:
+            return _check_alive(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def _prune_old_exports():
+    cutoff = time.time() - EXPORT_RETENTION_SECONDS
+    running = 0
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+            elif name.endswith('.json'):
+                with open(path, encoding='utf-8') as f:
+                    running += _check_alive(json.load(f)).get('status') in ('queued', 'running')
+        except (OSError, ValueError):
+            pass
+    return running
+
+
+def _job_context():
+    # Never fork: the worker already runs the sweeper, listener and breaker threads
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _run_job(database, job, where_sql, params):
+    # A fresh interpreter: just enough of an app for get_db (DATABASE_URL comes from the environment)
+    app = Flask(__name__)
+    app.config['DATABASE'] = database
+    app.teardown_appcontext(close_db)
+    job['status'] = 'running'
+    job['started_at'] = time.time()
+    job['pid'] = os.getpid()
+    job['host'] = socket.gethostname()
+    _save_job(job)
+    output_path = export_file_path(job)
+    try:
+        with app.app_context():
+            count = write_export(get_db(), output_path + '.part', job['format'], where_sql, params)
+        os.replace(output_path + '.part', output_path)
+        job.update(status='done', rows=count, size_bytes=os.path.getsize(output_path))
+    except Exception as e:
+        print(f"[Export] Job {job['id']} failed: {e}")
+        job.update(status='failed', error='Export failed')
+    job['finished_at'] = time.time()
+    _save_job(job)
+
+
+def start_export_job(app, fmt, where_sql='', params=(), requested_by=None):
+    """Queue an export and run it outside the request worker. Returns the job record."""
+    if fmt not in available_formats():
+        raise ExportError(f"Unsupported export format. Use one of: {', '.join(available_formats())}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    multiprocessing.active_children()  # Reap this worker's finished export children
+    if _prune_old_exports() >= EXPORT_MAX_RUNNING:
+        raise ExportBusy('Too many exports are running. Please try again shortly.')
+
+    job = {
+        'id': secrets.token_urlsafe(16),
+        'format': fmt,
+        'status': 'queued',
+        'requested_by': requested_by,
+        'created_at': time.time(),
+    }
+    _save_job(job)
+
+    # A child process keeps the export's CPU and I/O off this worker's GIL
+    args = (app.config['DATABASE'], job, where_sql, list(params))
+    _job_context().Process(target=_run_job, args=args, daemon=False).start()
+    return job
@@ -0,0 +1,135 @@
+"""
+In-memory catalog index used for retrieval (chatbot context, AI fallbacks).
+Holds a compact record per car plus a token -> car ids inverted index and
+per make/model price aggregates, rebuilt lazily when stale. A rebuild
+publishes all three together in one assignment, so readers never mix two builds.
+"""
+
+import json
+import os
+import threading
+import time
+
+from ..catalog import CARS
+from . import invalidation
+from .text_normalization import normalize_query
+
+# Field weights when a query token hits a car's make / model / body style / year
+MATCH_WEIGHTS = {'make': 3.0, 'model': 2.0, 'body': 1.0, 'year': 1.0}
+
+
+def tokenize(text):
+    """
+    Normalized word tokens (Arabic make/model names mapped to English, see
+    text_normalization); single characters are kept only if numeric (e.g. '3' Series).
+    """
+    if not text:
+        return []
+    return [t for t in normalize_query(text).split() if len(t) > 1 or t.isdigit()]
+
+
+class CatalogIndex:
+    def __init__(self, ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        # (records, postings, model_stats), swapped as one tuple
+        self._data = ({}, {}, {})
+        self._built_at = 0.0
+        self._stale = True
+        # Bumped by invalidate(); a build only counts as fresh if none arrived while it ran
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Mark the index stale; it is rebuilt on next use."""
+        self._generation += 1
+        self._stale = True
+
+    def _is_fresh(self):
+        return not self._stale and (time.monotonic() - self._built_at) < self.ttl_seconds
+
+    def ensure_fresh(self, db):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            self._build(db)
+
+    def _build(self, db):
+        started = time.monotonic()
+        generation = self._generation
+        cursor = db.execute('SELECT id, make, model, year, price, currency, specs FROM cars')
+        records = {}
+        postings = {}
+        prices_by_model = {}
+
+        for row in cursor.fetchall():
+            specs = row['specs']
+            if isinstance(specs, str):
+                try:
+                    specs = json.loads(specs)
+                except ValueError:
+                    specs = None
+            body = (specs or {}).get('bodyStyle') if isinstance(specs, dict) else None
+            record = {
+                'id': row['id'],
+                'make': row['make'],
+                'model': row['model'],
+                'year': row['year'],
+                'price': row['price'],
+                'currency': row['currency'] or 'JOD',
+                'body_style': body,
+            }
+            records[record['id']] = record
+
+            fields = (
+                ('make', tokenize(record['make'])),
+                ('model', tokenize(record['model'])),
+                ('body', tokenize(body)),
+                ('year', [str(record['year'])] if record['year'] else []),
+            )
+            for field, tokens in fields:
+                for token in tokens:
+                    postings.setdefault(token, {})
+                    # Keep the strongest field a token matched for this car
+                    weight = MATCH_WEIGHTS[field]
+                    if postings[token].get(record['id'], 0) < weight:
+                        postings[token][record['id']] = weight
+
+            if record['price']:
+                model_key = ((record['make'] or '').lower(), (record['model'] or '').lower())
+                prices_by_model.setdefault(model_key, []).append(record['price'])
+
+        model_stats = {key: self._summarize(prices) for key, prices in prices_by_model.items()}
+        self._data = (records, postings, model_stats)
+        self._built_at = time.monotonic()
+        # An invalidate() during the build may describe a write this build didn't see
+        self._stale = self._generation != generation
+        print(f"[Catalog Index] Indexed {len(records)} cars in {(time.monotonic() - started) * 1000:.0f}ms")
+
+    @staticmethod
+    def _summarize(prices):
+        return {
+            'count': len(prices),
+            'min': min(prices),
+            'avg': sum(prices) / len(prices),
+            'max': max(prices),
+        }
+
+    def search(self, text, limit=5):
+        """Return the top `limit` compact car records matching the text, best first."""
+        records, postings, _ = self._data
+        scores = {}
+        for token in set(tokenize(text)):
+            for car_id, weight in postings.get(token, {}).items():
+                scores[car_id] = scores.get(car_id, 0.0) + weight
+        # Deterministic order: score, then newest year, then lowest id
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -(records[item[0]]['year'] or 0), item[0]))
+        return [records[car_id] for car_id, _ in ranked[:limit]]
+
+    def model_stats(self, make, model):
+        return self._data[2].get(((make or '').lower(), (model or '').lower()))
+
+
+catalog_index = CatalogIndex(ttl_seconds=int(os.environ.get('CATALOG_INDEX_TTL', 300)))
+invalidation.subscribe(CARS, lambda event: catalog_index.invalidate())
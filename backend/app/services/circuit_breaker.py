@@ -0,0 +1,128 @@
+"""
+Circuit breaker for upstream service calls (Gemini).
+Trips after repeated failures or timeouts so callers can fail fast
+and serve a local fallback instead of waiting out an outage.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit is open and calls are short-circuited."""
+
+
+class UpstreamTimeoutError(Exception):
+    """Raised when an upstream call exceeds the configured timeout."""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures.
+    Open -> half-open after `reset_timeout` seconds, letting one trial call through.
+    Half-open -> closed on success, back to open on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, call_timeout=15.0,
+                 max_workers=4, ignore_exception=None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        # Exceptions matching this predicate are re-raised without counting as failures
+        # (e.g. safety blocks, which say nothing about upstream health)
+        self._ignore_exception = ignore_exception or (lambda exc: False)
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        # Bounded pool so hung upstream calls cannot pile up unbounded threads
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}-call')
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def is_open(self):
+        """True while calls would be short-circuited (without claiming a half-open trial)."""
+        with self._lock:
+            state = self._current_state()
+            return state == self.OPEN or (state == self.HALF_OPEN and self._trial_in_flight)
+
+    def allow_request(self):
+        """Return True if a call may go upstream right now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"[CircuitBreaker] {self.name} opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker, bounded by call_timeout."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        future = self._executor.submit(func, *args, **kwargs)
+        try:
+            result = future.result(timeout=self.call_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.record_failure()
+            raise UpstreamTimeoutError(f"{self.name} call timed out after {self.call_timeout}s")
+        except Exception as e:
+            if self._ignore_exception(e):
+                self.record_success()
+            else:
+                self.record_failure()
+            raise
+
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        """Current breaker status for /api/health (opened_at: epoch seconds of the last trip, if not closed)."""
+        with self._lock:
+            state = self._current_state()
+            opened_at = None
+            if state != self.CLOSED:
+                opened_at = round(time.time() - (time.monotonic() - self._opened_at), 3)
+            return {
+                'state': state,
+                'opened_at': opened_at,
+                'failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'call_timeout': self.call_timeout,
+            }
@@ -0,0 +1,112 @@
+"""
+Facet counts for the catalog filter sidebar.
+
+All facets are computed by one statement: a UNION ALL of grouped counts, one
+branch per facet. Each branch applies every active filter except the facet's
+own, so a sidebar with make=Toyota still lists the other makes with the
+counts the user would get by switching to them. Results are cached per filter
+signature and cars catalog version; a write bumps the version, so cached
+counts are never served stale.
+"""
+
+import os
+
+from ..cache import TTLCache
+from ..catalog import CARS, get_catalog_versions, filter_signature
+from . import invalidation
+
+# Facet name (as returned to the client) -> (SQL expression, filter arguments it owns)
+FACET_FIELDS = {
+    'make': ('make', ('make',)),
+    'category': ('category', ('category',)),
+    'condition': ('condition', ('condition',)),
+    'transmission': ('transmission', ('transmission',)),
+    'fuelType': ('fuel_type', ('fuelType',)),
+    'city': ('city', ('city',)),
+    'price': (None, ('min_price', 'max_price')),
+}
+
+# Upper bounds of the price buckets (JOD); the last bucket is open-ended
+PRICE_BUCKETS = (5000, 10000, 20000, 30000, 50000, 75000, 100000)
+
+_facet_cache = TTLCache(
+    max_size=int(os.environ.get('FACET_CACHE_SIZE', 512)),
+    ttl=int(os.environ.get('FACET_CACHE_TTL', 300))
+)
+
+
+def _on_cars_event(event):
+    # Keys lead with the cars version: anything older can never be read again
+    version = event['version'] or 0
+    _facet_cache.delete_where(lambda key, value: key[0] < version)
+
+
+invalidation.subscribe(CARS, _on_cars_event)
+
+
+def parse_facets(value):
+    """?facets=1 (all) or ?facets=make,city -> tuple of facet names, or () when not requested."""
+    if not value or value in ('0', 'false'):
+        return ()
+    if value in ('1', 'true', 'all'):
+        return tuple(FACET_FIELDS)
+    return tuple(name for name in FACET_FIELDS if name in {part.strip() for part in value.split(',')})
+
+
+def _price_bucket_sql():
+    cases = ' '.join(f"WHEN price < {bound} THEN '{index}'" for index, bound in enumerate(PRICE_BUCKETS))
+    return f"CASE {cases} ELSE '{len(PRICE_BUCKETS)}' END"
+
+
+def _price_bucket(label):
+    index = int(label)
+    return {
+        'min': PRICE_BUCKETS[index - 1] if index else 0,
+        'max': PRICE_BUCKETS[index] if index < len(PRICE_BUCKETS) else None,
+    }
+
+
+def compute_facets(db, args, names, build_filters):
+    """
+    {facet: [{"value", "count"}, ...]} for the given facet names under the
+    filters in args (price buckets carry "min"/"max" instead of "value").
+    build_filters is the listing filter builder (routes.cars.build_car_filters).
+    """
+    if not names:
+        return {}
+    signature = (get_catalog_versions(db).get(CARS, (0, None))[0], filter_signature(args), names)
+    cached = _facet_cache.get(signature)
+    if cached is not None:
+        return cached
+
+    branches = []
+    params = []
+    for name in names:
+        expression, owned = FACET_FIELDS[name]
+        if name == 'price':
+            expression = _price_bucket_sql()
+        own_args = {key: value for key, value in args.items() if key not in owned}
+        conditions, branch_params = build_filters(own_args)
+        null_check = 'price IS NOT NULL' if name == 'price' else f'{expression} IS NOT NULL'
+        branches.append(
+            f"SELECT '{name}' AS facet, {expression} AS value, COUNT(*) AS count "
+            f"FROM cars WHERE {null_check}{conditions} GROUP BY 2"
+        )
+        params.extend(branch_params)
+
+    facets = {name: [] for name in names}
+    for row in db.execute(' UNION ALL '.join(branches), params).fetchall():
+        if row['value'] in (None, ''):
+            continue
+        if row['facet'] == 'price':
+            facets['price'].append({**_price_bucket(row['value']), 'count': row['count']})
+        else:
+            facets[row['facet']].append({'value': row['value'], 'count': row['count']})
+
+    for name, buckets in facets.items():
+        if name == 'price':
+            buckets.sort(key=lambda bucket: bucket['min'])
+        else:
+            buckets.sort(key=lambda bucket: (-bucket['count'], str(bucket['value'])))
+    _facet_cache.set(signature, facets)
+    return facets
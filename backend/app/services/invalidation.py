@@ -0,0 +1,179 @@
+"""
+Cross-worker cache invalidation bus.
+
+Every gunicorn worker keeps its own in-process caches (taxonomy, catalog
+index, session lookups, facet and count caches, ...). A write publishes an
+event {entity, id, version} inside its own transaction; every other worker
+receives it after the commit and evicts what the event affects.
+
+Backends (INVALIDATION_BACKEND):
+    postgres  LISTEN/NOTIFY on one channel; NOTIFY is delivered at commit
+    sqlite    an invalidation_events table polled every
+              INVALIDATION_POLL_SECONDS (development and single-host setups)
+    none      publish and listen are no-ops
+    auto      (default) postgres or sqlite, following the database in use
+
+Cache owners register handlers with subscribe(entity, handler). Handlers get
+the event dict and run in the listener thread inside an app context, so they
+may use get_db(). Events from the publishing worker itself are skipped: it
+has already updated its own caches.
+"""
+
+import json
+import os
+import select
+import socket
+import threading
+import time
+
+INVALIDATION_BACKEND = os.environ.get('INVALIDATION_BACKEND', 'auto').lower()
+INVALIDATION_POLL_SECONDS = float(os.environ.get('INVALIDATION_POLL_SECONDS', 1.0))
+EVENT_RETENTION_SECONDS = int(os.environ.get('INVALIDATION_EVENT_RETENTION', 600))
+CHANNEL = 'intelliwheels_invalidation'
+
+# Entities besides the catalog ones (catalog.CARS, catalog.DEALERS)
+SESSIONS = 'sessions'          # id: user id whose sessions changed
+REVOCATIONS = 'revocations'    # id: revoked access token jti
+
+_handlers = {}
+_listener_pid = None
+_HOST = socket.gethostname()
+
+
+def origin():
+    """Identifies this worker process in published events."""
+    return f"{_HOST}:{os.getpid()}"
+
+
+def subscribe(entity, handler):
+    """Call handler(event) for every event about entity published by another worker."""
+    _handlers.setdefault(entity, []).append(handler)
+
+
+def dispatch(app, event):
+    if event.get('origin') == origin():
+        return
+    handlers = _handlers.get(event.get('entity'), ())
+    if not handlers:
+        return
+    with app.app_context():
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"[Invalidation] Handler for {event.get('entity')} failed: {e}")
+
+
+class PostgresBus:
+    name = 'postgres'
+
+    def publish(self, db, event):
+        db.execute('SELECT pg_notify(?, ?)', (CHANNEL, json.dumps(event)))
+
+    def listen(self, app, on_event):
+        import psycopg2
+        database_url = os.environ.get('DATABASE_URL', '')
+        if database_url.startswith('postgres://'):
+            database_url = database_url.replace('postgres://', 'postgresql://', 1)
+        while True:
+            try:
+                connection = psycopg2.connect(database_url)
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN {CHANNEL}')
+                print(f"[Invalidation] Listening on {CHANNEL}")
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        on_event(json.loads(notify.payload))
+            except Exception as e:
+                print(f"[Invalidation] Listener connection lost: {e}; reconnecting")
+                time.sleep(5)
+
+
+class SQLiteBus:
+    name = 'sqlite'
+
+    def publish(self, db, event):
+        db.execute(
+            'INSERT INTO invalidation_events (entity, entity_id, version, origin) VALUES (?, ?, ?, ?)',
+            (event['entity'], event['id'], event['version'], event['origin'])
+        )
+
+    def listen(self, app, on_event):
+        import sqlite3
+        connection = sqlite3.connect(app.config['DATABASE'])
+        connection.row_factory = sqlite3.Row
+        last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM invalidation_events').fetchone()[0]
+        pruned_at = time.monotonic()
+        while True:
+            time.sleep(INVALIDATION_POLL_SECONDS)
+            try:
+                rows = connection.execute(
+                    'SELECT id, entity, entity_id, version, origin FROM invalidation_events WHERE id > ? ORDER BY id',
+                    (last_id,)
+                ).fetchall()
+                for row in rows:
+                    last_id = row['id']
+                    on_event({'entity': row['entity'], 'id': row['entity_id'],
+                              'version': row['version'], 'origin': row['origin']})
+                if time.monotonic() - pruned_at > EVENT_RETENTION_SECONDS:
+                    connection.execute(
+                        "DELETE FROM invalidation_events WHERE created_at < datetime('now', ?)",
+                        (f'-{EVENT_RETENTION_SECONDS} seconds',)
+                    )
+                    connection.commit()
+                    pruned_at = time.monotonic()
+            except Exception as e:
+                print(f"[Invalidation] Poll failed: {e}")
+
+
+class NullBus:
+    name = 'none'
+
+    def publish(self, db, event):
+        pass
+
+    def listen(self, app, on_event):
+        pass
+
+
+def _select_bus():
+    from ..db import is_postgres, HAS_POSTGRES
+    backend = INVALIDATION_BACKEND
+    if backend == 'auto':
+        backend = 'postgres' if is_postgres() and HAS_POSTGRES else 'sqlite'
+    return {'postgres': PostgresBus, 'sqlite': SQLiteBus}.get(backend, NullBus)()
+
+
+bus = _select_bus()
+
+
+def publish(db, entity, entity_id=None, version=None):
+    """Queue an invalidation event in the caller's transaction (delivered once the caller commits)."""
+    event = {
+        'entity': entity,
+        'id': None if entity_id is None else str(entity_id),
+        'version': version,
+        'origin': origin(),
+    }
+    try:
+        bus.publish(db, event)
+    except Exception as e:
+        # Other workers fall back to their cache TTLs / version checks
+        print(f"[Invalidation] Publish failed: {e}")
+
+
+def start_invalidation_listener(app):
+    """Start one daemon listener thread per worker process."""
+    global _listener_pid
+    if isinstance(bus, NullBus) or app.config.get('TESTING') or _listener_pid == os.getpid():
+        return
+    _listener_pid = os.getpid()
+    thread = threading.Thread(
+        target=bus.listen, args=(app, lambda event: dispatch(app, event)),
+        name='invalidation-listener', daemon=True
+    )
+    thread.start()
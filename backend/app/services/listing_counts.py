@@ -0,0 +1,72 @@
+"""
+Total counts for filtered listing pages (GET /api/cars).
+
+?count= picks the strategy:
+    auto (default)  exact count, cached per filter signature and cars catalog
+                    version; on PostgreSQL, filters the planner expects to
+                    match more than COUNT_ESTIMATE_THRESHOLD rows get the
+                    planner's estimate instead of a full count
+    exact           always an exact (cached) count
+    estimate        the planner estimate on PostgreSQL, exact elsewhere
+    none            no count at all (infinite scroll)
+Callers get (total, exact); total is None for ?count=none.
+"""
+
+import os
+
+from ..cache import TTLCache
+from ..catalog import CARS, get_catalog_versions, filter_signature
+from ..db import PostgresConnectionWrapper
+from . import invalidation
+
+COUNT_STRATEGIES = ('auto', 'exact', 'estimate', 'none')
+COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('COUNT_ESTIMATE_THRESHOLD', 50000))
+
+_count_cache = TTLCache(
+    max_size=int(os.environ.get('COUNT_CACHE_SIZE', 2048)),
+    ttl=int(os.environ.get('COUNT_CACHE_TTL', 300))
+)
+
+
+def _on_cars_event(event):
+    # Counts for older versions are dead entries; free them rather than wait out the TTL
+    version = event['version'] or 0
+    _count_cache.delete_where(lambda key, value: key[0] < version)
+
+
+invalidation.subscribe(CARS, _on_cars_event)
+
+
+def planner_estimate(db, base_query, params):
+    """Row estimate from EXPLAIN (PostgreSQL only); None if the plan can't be read."""
+    try:
+        plan = db.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 {base_query}", params).fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        # A failed statement aborts the PostgreSQL transaction; clear it for the count
+        db.rollback()
+        print(f"[Counts] Estimate failed: {e}")
+        return None
+
+
+def listing_total(db, base_query, params, args):
+    """(total, exact) for `SELECT ... {base_query}` under the requested count strategy."""
+    strategy = args.get('count', 'auto')
+    if strategy not in COUNT_STRATEGIES:
+        strategy = 'auto'
+    if strategy == 'none':
+        return None, False
+
+    key = (get_catalog_versions(db).get(CARS, (0, None))[0], filter_signature(args))
+    cached = _count_cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    if strategy in ('auto', 'estimate') and isinstance(db, PostgresConnectionWrapper):
+        estimate = planner_estimate(db, base_query, params)
+        if estimate is not None and (strategy == 'estimate' or estimate >= COUNT_ESTIMATE_THRESHOLD):
+            return estimate, False
+
+    total = db.execute(f"SELECT COUNT(*) as total {base_query}", params).fetchone()['total']
+    _count_cache.set(key, total)
+    return total, True
@@ -0,0 +1,118 @@
+"""
+Password hashing and verification offloaded to a bounded process pool.
+
+PBKDF2 at production cost takes hundreds of milliseconds of CPU; running it in
+a small dedicated pool keeps login storms from starving request workers.
+Each gunicorn worker owns its own pool, so a deployment runs
+workers x PASSWORD_HASH_WORKERS hashing processes.
+
+Pool children are started by a forkserver (spawn where that is unavailable),
+never forked from the worker itself: by the time the first login arrives the
+worker runs the session sweeper and invalidation listener threads, and a child
+forked mid-lock would deadlock. Like any forkserver/spawn child, each one
+re-runs the main script as __mp_main__, so entry scripts must not build the
+app at import time (run.py builds it lazily; gunicorn's own entry point is
+guarded). The tasks are Werkzeug's own functions, so unpickling them needs
+nothing from the app package.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:260000'
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashes are already queued in this worker, or one takes too long."""
+
+
+def _pool_context():
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # Nothing to preload: the server only forks children for Werkzeug calls
+    context.set_forkserver_preload([])
+    return context
+
+
+class PasswordService:
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=2, max_pending=16, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+
+    def _get_pool(self):
+        """Lazily start the pool for the current worker process."""
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset_pool(self):
+        with self._lock:
+            self._pool = None
+
+    def _run(self, func, *args, **kwargs):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Password hashing queue is full')
+        try:
+            pool = self._get_pool()
+            if pool is None:
+                return func(*args, **kwargs)
+            try:
+                return self._result(pool, func, args, kwargs)
+            except BrokenProcessPool:
+                # A child died (e.g. OOM-killed); start a fresh pool and retry once
+                self._reset_pool()
+                return self._result(self._get_pool(), func, args, kwargs)
+        finally:
+            self._slots.release()
+
+    def _result(self, pool, func, args, kwargs):
+        future = pool.submit(func, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drops it if still queued; a hash already running finishes in the background
+            future.cancel()
+            raise PasswordHasherBusy('Password hashing timed out')
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify_password(self, password_hash, password):
+        """Return (matches, needs_rehash)."""
+        matches = self._run(check_password_hash, password_hash, password)
+        return matches, matches and self.needs_rehash(password_hash)
+
+    def _configured_prefix(self):
+        # Werkzeug expands a bare method ("scrypt" -> "scrypt:32768:8:1"); hash once, in the pool,
+        # to learn the stored form
+        if self._method_prefix is None:
+            self._method_prefix = self.hash_password('').split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with different cost parameters than configured."""
+        return (password_hash or '').split('$', 1)[0] != self._configured_prefix()
+
+
+password_service = PasswordService(
+    method=os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16)),
+    timeout=float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10)),
+)
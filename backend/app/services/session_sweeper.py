@@ -0,0 +1,93 @@
+"""
+Session table maintenance.
+A background thread per worker deletes expired sessions in bounded batches,
+and login caps each user's live sessions with a keyset cutoff.
+"""
+
+import os
+import random
+import threading
+import time
+
+MAX_SESSIONS_PER_USER = int(os.environ.get('MAX_SESSIONS_PER_USER', 5))
+SWEEP_INTERVAL_SECONDS = int(os.environ.get('SESSION_SWEEP_INTERVAL', 600))
+SWEEP_BATCH_SIZE = int(os.environ.get('SESSION_SWEEP_BATCH_SIZE', 500))
+SWEEP_MAX_BATCHES = 20
+
+_sweeper_pid = None
+
+
+def sweep_expired_sessions(db, batch_size=SWEEP_BATCH_SIZE, max_batches=SWEEP_MAX_BATCHES):
+    """Delete expired sessions in batches (short transactions). Returns rows deleted."""
+    total = 0
+    for _ in range(max_batches):
+        cursor = db.execute('''
+            DELETE FROM user_sessions WHERE token IN (
+                SELECT token FROM user_sessions
+                WHERE expires_at < CURRENT_TIMESTAMP
+                LIMIT ?
+            )
+        ''', (batch_size,))
+        db.commit()
+        deleted = cursor.rowcount or 0
+        total += deleted
+        if deleted < batch_size:
+            break
+    return total
+
+
+def cap_user_sessions(db, user_id, keep=MAX_SESSIONS_PER_USER):
+    """
+    Make room for one new session: drop the user's expired sessions and all but
+    the newest `keep - 1` live ones, so exactly `keep` remain once the new session
+    is inserted. The cutoff is the (keep - 1)th newest (created_at, token) pair,
+    read from idx_user_sessions_user_created; token breaks ties between sessions
+    created in the same second.
+    """
+    if keep <= 1:
+        db.execute('DELETE FROM user_sessions WHERE user_id = ?', (user_id,))
+        return
+    cutoff = db.execute('''
+        SELECT created_at, token FROM user_sessions
+        WHERE user_id = ? AND (expires_at IS NULL OR expires_at >= CURRENT_TIMESTAMP)
+        ORDER BY created_at DESC, token DESC
+        LIMIT 1 OFFSET ?
+    ''', (user_id, keep - 2)).fetchone()
+    if cutoff is None:
+        # Fewer than keep - 1 live sessions: only the expired ones go
+        db.execute('DELETE FROM user_sessions WHERE user_id = ? AND expires_at < CURRENT_TIMESTAMP', (user_id,))
+        return
+    db.execute('''
+        DELETE FROM user_sessions
+        WHERE user_id = ? AND (expires_at < CURRENT_TIMESTAMP OR (created_at, token) < (?, ?))
+    ''', (user_id, cutoff[0], cutoff[1]))
+
+
+def _sweep_loop(app, interval):
+    from ..db import get_db
+    from .access_tokens import revocation_list
+    while True:
+        # Jitter so workers started together don't sweep in lockstep
+        time.sleep(interval * random.uniform(0.8, 1.2))
+        try:
+            with app.app_context():
+                db = get_db()
+                deleted = sweep_expired_sessions(db)
+                revocation_list.purge(db)
+            if deleted:
+                print(f"[Session Sweeper] Deleted {deleted} expired sessions")
+        except Exception as e:
+            print(f"[Session Sweeper] Sweep failed: {e}")
+
+
+def start_session_sweeper(app):
+    """Start one daemon sweeper thread per worker process (SESSION_SWEEP_INTERVAL=0 disables)."""
+    global _sweeper_pid
+    if SWEEP_INTERVAL_SECONDS <= 0 or app.config.get('TESTING') or _sweeper_pid == os.getpid():
+        return
+    _sweeper_pid = os.getpid()
+    thread = threading.Thread(
+        target=_sweep_loop, args=(app, SWEEP_INTERVAL_SECONDS),
+        name='session-sweeper', daemon=True
+    )
+    thread.start()
@@ -0,0 +1,174 @@
+"""
+In-memory make -> model -> engine/trim taxonomy behind /api/makes, /api/models,
+/api/engines and /api/autocomplete. Built with one scan of cars per catalog
+version and kept as per-car (make, model, engine, trim) entries plus a
+reference-counted tree, so a write is applied by reloading just the written
+cars: writes made by this process directly, writes made by other workers when
+their invalidation event arrives. A version that was missed (an import
+script, a dropped event) triggers a full rebuild on next use.
+"""
+
+import threading
+import time
+
+from ..catalog import CARS, get_catalog_versions
+from ..db import get_db
+from . import invalidation
+
+# engine is a generated column (specs.engine, else the first engines entry; see db.py)
+TAXONOMY_QUERY = "SELECT id, make, model, trim, engine FROM cars"
+
+
+class Taxonomy:
+    def __init__(self):
+        self._cars = {}
+        self._tree = {}
+        self._views = {}
+        self._version = None
+        # Reentrant: derived indexes are computed under the lock and read the tree
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _entry(row):
+        engine, trim = row['engine'], row['trim']
+        return (
+            row['make'], row['model'],
+            engine if engine not in (None, '') else None,
+            trim.strip() if trim and trim.strip() else None,
+        )
+
+    @staticmethod
+    def _count(counts, key, delta):
+        if key is None:
+            return
+        counts[key] = counts.get(key, 0) + delta
+        if not counts[key]:
+            del counts[key]
+
+    def _add(self, car_id, entry):
+        make, model, engine, trim = entry
+        self._cars[car_id] = entry
+        node = self._tree.setdefault(make, {}).setdefault(model, {'cars': 0, 'engines': {}, 'trims': {}})
+        node['cars'] += 1
+        self._count(node['engines'], engine, 1)
+        self._count(node['trims'], trim, 1)
+
+    def _remove(self, car_id):
+        entry = self._cars.pop(car_id, None)
+        if entry is None:
+            return
+        make, model, engine, trim = entry
+        models = self._tree[make]
+        node = models[model]
+        node['cars'] -= 1
+        self._count(node['engines'], engine, -1)
+        self._count(node['trims'], trim, -1)
+        if not node['cars']:
+            del models[model]
+        if not models:
+            del self._tree[make]
+
+    def _current_version(self, db):
+        return get_catalog_versions(db).get(CARS, (0, None))[0]
+
+    def _build(self, db, version):
+        started = time.monotonic()
+        self._cars, self._tree, self._views = {}, {}, {}
+        for row in db.execute(TAXONOMY_QUERY).fetchall():
+            if row['make'] and row['model']:
+                self._add(row['id'], self._entry(row))
+        self._version = version
+        print(f"[Taxonomy] Built v{version} from {len(self._cars)} cars in {(time.monotonic() - started) * 1000:.0f}ms")
+
+    def ensure_current(self, db):
+        # Version is read before the scan: a write landing in between leaves us
+        # labelled one version behind, which only costs an extra rebuild.
+        version = self._current_version(db)
+        if version == self._version:
+            return
+        with self._lock:
+            if version != self._version:
+                self._build(db, version)
+
+    def apply_write(self, db, car_ids, version=None):
+        """
+        Reload these cars after a committed write that bumped the cars version
+        once (to `version`, read from the database when not given).
+        """
+        if version is None:
+            version = self._current_version(db)
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                return  # Missed someone else's write; rebuild lazily instead
+            placeholders = ','.join(['?'] * len(car_ids))
+            rows = db.execute(f"{TAXONOMY_QUERY} WHERE id IN ({placeholders})", list(car_ids)).fetchall()
+            for car_id in car_ids:
+                self._remove(car_id)
+            for row in rows:
+                if row['make'] and row['model']:
+                    self._add(row['id'], self._entry(row))
+            self._views = {}
+            self._version = version
+
+    def view(self, key, compute):
+        """
+        Memoize compute() until the taxonomy next changes. Also used by indexes
+        built on top of the taxonomy (autocomplete). A hit is a plain dict read.
+        """
+        view = self._views.get(key)
+        if view is None:
+            with self._lock:
+                view = self._views[key] = compute()
+        return view
+
+    def _models_of(self, make):
+        lowered = (make or '').lower()
+        return [models for name, models in self._tree.items() if name.lower() == lowered]
+
+    def makes(self):
+        return self.view('makes', lambda: sorted(self._tree))
+
+    def models(self, make):
+        return self.view(('models', (make or '').lower()), lambda: sorted({
+            model for models in self._models_of(make) for model in models
+        }))
+
+    def models_by_make(self):
+        return self.view('models_by_make', lambda: {
+            make: sorted(self._tree[make]) for make in sorted(self._tree)
+        })
+
+    def _attribute(self, attribute, make, model):
+        lowered = (model or '').lower()
+        return self.view((attribute, (make or '').lower(), lowered), lambda: sorted({
+            value
+            for models in self._models_of(make)
+            for name, node in models.items() if name.lower() == lowered
+            for value in node[attribute]
+        }, key=str))
+
+    def engines(self, make, model):
+        return self._attribute('engines', make, model)
+
+    def trims(self, make, model):
+        return self._attribute('trims', make, model)
+
+    def model_nodes(self):
+        """Yield (make, model, node) for every model; node has 'cars', 'engines' and 'trims' counts."""
+        for make, models in self._tree.items():
+            for model, node in models.items():
+                yield make, model, node
+
+
+taxonomy = Taxonomy()
+
+
+def _on_cars_event(event):
+    if event['id'] is None:
+        # A bulk change (seed/import at startup): rebuild here in the listener, not in a request
+        taxonomy.ensure_current(get_db())
+    else:
+        taxonomy.apply_write(get_db(), [int(event['id'])], event['version'])
+
+
+invalidation.subscribe(CARS, _on_cars_event)
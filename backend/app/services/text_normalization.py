@@ -0,0 +1,216 @@
+"""
+Text normalization shared by search features: one canonical form for make /
+model / trim names and user queries, plus the Arabic spellings people use
+for the makes and models sold in Jordan.
+
+The same pipeline runs at index time (stored search text, catalog index,
+autocomplete) and at query time, so an Arabic query is matched against the
+same English keys as an English one:
+    normalize_text: NFKC, case folding, Latin accents, Arabic letter folding,
+                    harakat/tatweel stripping, Arabic-Indic digits, punctuation
+    normalize_query: normalize_text, then Arabic make/model names -> English
+"""
+
+import re
+import unicodedata
+
+NON_WORD_PATTERN = re.compile(r'[^\w]+|_', re.UNICODE)
+
+# Letter variants people type interchangeably (hamza seats, alef maqsura, ta marbuta)
+ARABIC_FOLDING = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    'ـ': None,  # tatweel (kashida)
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # Extended (Persian) digits
+})
+
+# Longest Arabic alias phrase, in words
+MAX_ALIAS_WORDS = 3
+
+# Canonical (normalized) English name -> Arabic spellings in common use
+ARABIC_ALIASES = {
+    # Makes
+    'toyota': ['تويوتا'],
+    'hyundai': ['هيونداي', 'هونداي', 'هيونداى'],
+    'kia': ['كيا'],
+    'bmw': ['بي ام دبليو', 'بي إم دبليو', 'بيم'],
+    'mercedes benz': ['مرسيدس بنز', 'مرسيدس', 'مارسيدس'],
+    'mercedes': ['مرسيدس', 'مارسيدس'],
+    'nissan': ['نيسان'],
+    'honda': ['هوندا'],
+    'mitsubishi': ['ميتسوبيشي', 'متسوبيشي'],
+    'lexus': ['لكزس', 'لكسس'],
+    'ford': ['فورد'],
+    'chevrolet': ['شفروليه', 'شيفروليه', 'شفر'],
+    'volkswagen': ['فولكس فاجن', 'فولكسفاجن', 'فولكس واجن'],
+    'audi': ['اودي', 'أودي'],
+    'porsche': ['بورش', 'بورشه'],
+    'land rover': ['لاند روفر'],
+    'range rover': ['رنج روفر', 'رينج روفر'],
+    'jeep': ['جيب'],
+    'mazda': ['مازدا'],
+    'peugeot': ['بيجو'],
+    'renault': ['رينو'],
+    'tesla': ['تسلا'],
+    'suzuki': ['سوزوكي'],
+    'isuzu': ['ايسوزو', 'إيسوزو'],
+    'gmc': ['جي ام سي', 'جمس'],
+    'cadillac': ['كاديلاك'],
+    'dodge': ['دودج'],
+    'chrysler': ['كرايسلر'],
+    'skoda': ['سكودا'],
+    'jaguar': ['جاكوار', 'جاغوار'],
+    'volvo': ['فولفو'],
+    'subaru': ['سوبارو'],
+    'infiniti': ['انفينيتي', 'إنفينيتي'],
+    'geely': ['جيلي'],
+    'chery': ['شيري'],
+    'byd': ['بي واي دي'],
+    'mg': ['ام جي', 'إم جي'],
+    # Models
+    'land cruiser': ['لاند كروزر', 'لاندكروزر'],
+    'camry': ['كامري'],
+    'corolla': ['كورولا'],
+    'prado': ['برادو'],
+    'hilux': ['هايلكس', 'هيلوكس'],
+    'rav4': ['راف فور', 'راف 4'],
+    'yaris': ['يارس', 'ياريس'],
+    'prius': ['بريوس'],
+    'elantra': ['النترا', 'إلنترا'],
+    'sonata': ['سوناتا'],
+    'tucson': ['توسان'],
+    'accent': ['اكسنت', 'أكسنت'],
+    'santa fe': ['سانتا في', 'سنتافي'],
+    'avante': ['افانتي', 'أفانتي'],
+    'sportage': ['سبورتاج'],
+    'sorento': ['سورينتو'],
+    'cerato': ['سيراتو'],
+    'optima': ['اوبتيما', 'أوبتيما'],
+    'picanto': ['بيكانتو'],
+    'k5': ['كي 5'],
+    'patrol': ['باترول'],
+    'sunny': ['صني'],
+    'altima': ['التيما', 'ألتيما'],
+    'civic': ['سيفيك'],
+    'accord': ['اكورد', 'أكورد'],
+    'golf': ['جولف', 'غولف'],
+    'passat': ['باسات'],
+    'tiguan': ['تيغوان', 'تيجوان'],
+    'c class': ['سي كلاس'],
+    'e class': ['اي كلاس', 'إي كلاس'],
+    's class': ['اس كلاس', 'إس كلاس'],
+    'g class': ['جي كلاس'],
+    'model 3': ['موديل 3'],
+    'model y': ['موديل واي'],
+}
+
+
+def normalize_text(text):
+    """
+    Canonical search form: NFKC, case-folded, accents and harakat stripped,
+    Arabic letters folded, and every run of punctuation/whitespace collapsed to
+    one space ("Mercedes-Benz" -> "mercedes benz", "مَرْسيدس" -> "مرسيدس").
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).casefold().translate(ARABIC_FOLDING)
+    # NFKD splits accents (and Arabic harakat/hamza marks) into combining characters
+    text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+    return NON_WORD_PATTERN.sub(' ', text).strip()
+
+
+def arabic_aliases(name):
+    """Arabic spellings of a make/model/trim name (already normalized), if known."""
+    return _ARABIC_SPELLINGS.get(name, [])
+
+
+def _build_alias_tables():
+    spellings = {}
+    to_english = {}
+    for english, aliases in ARABIC_ALIASES.items():
+        folded = list(dict.fromkeys(normalize_text(alias) for alias in aliases))
+        spellings[english] = folded
+        for alias in folded:
+            # "مرسيدس" is listed for both "mercedes" and "mercedes benz": the
+            # shorter name matches more stored text, so it wins
+            if alias not in to_english or len(english) < len(to_english[alias]):
+                to_english[alias] = english
+    return spellings, to_english
+
+
+_ARABIC_SPELLINGS, _ARABIC_TO_ENGLISH = _build_alias_tables()
+
+
+def translate_aliases(normalized):
+    """Replace known Arabic make/model names in normalized text with their English names (longest phrase first)."""
+    words = normalized.split()
+    if not words or normalized.isascii():
+        return normalized
+    out = []
+    i = 0
+    while i < len(words):
+        for size in range(min(MAX_ALIAS_WORDS, len(words) - i), 0, -1):
+            english = _ARABIC_TO_ENGLISH.get(' '.join(words[i:i + size]))
+            if english:
+                out.append(english)
+                i += size
+                break
+        else:
+            out.append(words[i])
+            i += 1
+    return ' '.join(out)
+
+
+def normalize_query(text):
+    """Query-time normalization: normalize_text plus Arabic -> English make/model names."""
+    return translate_aliases(normalize_text(text))
+
+
+def search_text(*names):
+    """Stored search form of a listing's names (make, model, trim), for LIKE matching."""
+    return ' '.join(filter(None, (normalize_text(name) for name in names)))
+
+
+def refresh_search_text(db, car_ids=None):
+    """Recompute cars.search_text for the given cars (or every car missing it). The caller commits."""
+    if car_ids is None:
+        rows = db.execute('SELECT id, make, model, trim FROM cars WHERE search_text IS NULL').fetchall()
+    elif car_ids:
+        placeholders = ','.join(['?'] * len(car_ids))
+        rows = db.execute(f'SELECT id, make, model, trim FROM cars WHERE id IN ({placeholders})',
+                          list(car_ids)).fetchall()
+    else:
+        rows = []
+    for row in rows:
+        db.execute('UPDATE cars SET search_text = ? WHERE id = ?',
+                   (search_text(row['make'], row['model'], row['trim']), row['id']))
+    return len(rows)
+
+
+def refresh_search_text_after_import(connection):
+    """
+    refresh_search_text for an import script's own sqlite3/psycopg2 connection
+    (no app): fills search_text on every car missing it, adding the column to
+    tables the script recreated. Running workers search imported cars without
+    a restart. Commits.
+    """
+    postgres = type(connection).__module__.startswith('psycopg2')
+    cursor = connection.cursor()
+    if postgres:
+        cursor.execute('ALTER TABLE cars ADD COLUMN IF NOT EXISTS search_text TEXT')
+    else:
+        cursor.execute('PRAGMA table_info(cars)')
+        if 'search_text' not in {column[1] for column in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE cars ADD COLUMN search_text TEXT')
+    # SELECT * because recreated tables may lack trim
+    cursor.execute('SELECT * FROM cars WHERE search_text IS NULL')
+    names = [column[0] for column in cursor.description]
+    updates = []
+    for row in cursor.fetchall():
+        car = dict(zip(names, row))
+        updates.append((search_text(car['make'], car['model'], car.get('trim')), car['id']))
+    placeholder = '%s' if postgres else '?'
+    cursor.executemany(f'UPDATE cars SET search_text = {placeholder} WHERE id = {placeholder}', updates)
+    connection.commit()
+    return len(updates)
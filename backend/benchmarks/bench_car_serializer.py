@@ -0,0 +1,103 @@
+"""Benchmark car serialization over full catalog pages, legacy vs compiled serializer.
+
+Reads up to --limit rows from the SQLite catalog and reports, per page, the time
+to turn rows into dicts, the time to encode them, and the payload size.
+
+    python benchmarks/bench_car_serializer.py --db intelliwheels.db --limit 1000
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from flask import Flask
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SERIALIZERS_PATH = BASE_DIR / "app" / "serializers.py"
+
+
+def load_serializers():
+    # Load the module by path: importing the `app` package would build the Flask app
+    spec = importlib.util.spec_from_file_location("serializers", SERIALIZERS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_row_to_dict(row):
+    """car_row_to_dict as it was before app/serializers.py."""
+    d = dict(row)
+    for field in ['specs', 'engines', 'statistics', 'gallery_images', 'media_gallery', 'image_urls', 'source_sheets']:
+        if d.get(field):
+            if isinstance(d[field], str):
+                try:
+                    d[field] = json.loads(d[field])
+                except:
+                    d[field] = None
+    if d.get('image_url') and not d.get('image'):
+        d['image'] = d['image_url']
+    if d.get('gallery_images'):
+        d['galleryImages'] = d['gallery_images']
+    if d.get('media_gallery'):
+        d['mediaGallery'] = d['media_gallery']
+    if d.get('video_url'):
+        d['videoUrl'] = d['video_url']
+    if d.get('odometer_km') is not None:
+        d['odometerKm'] = d['odometer_km']
+    if d.get('exterior_color'):
+        d['exteriorColor'] = d['exterior_color']
+    if d.get('interior_color'):
+        d['interiorColor'] = d['interior_color']
+    if d.get('fuel_type'):
+        d['fuelType'] = d['fuel_type']
+    if d.get('regional_spec'):
+        d['regionalSpec'] = d['regional_spec']
+    if d.get('payment_type'):
+        d['paymentType'] = d['payment_type']
+    return d
+
+
+def timed(func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("DATABASE_PATH", str(BASE_DIR / "intelliwheels.db")))
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.db)
+    connection.row_factory = sqlite3.Row
+    rows = connection.execute("SELECT * FROM cars ORDER BY created_at DESC LIMIT ?", (args.limit,)).fetchall()
+    serializers = load_serializers()
+    app = Flask(__name__)
+    print(f"Rows: {len(rows)}  |  orjson: {'yes' if serializers.HAS_ORJSON else 'no'}")
+
+    with app.app_context():
+        legacy_ms, legacy_cars = timed(lambda: [legacy_row_to_dict(row) for row in rows], args.repeat)
+        legacy_encode_ms, legacy_body = timed(lambda: app.json.dumps({'cars': legacy_cars}).encode('utf-8'), args.repeat)
+        compiled_ms, compiled_cars = timed(lambda: serializers.serialize_cars(rows), args.repeat)
+        compiled_encode_ms, compiled_body = timed(lambda: serializers.dumps({'cars': compiled_cars}), args.repeat)
+
+    print(f"{'':10} {'rows->dicts':>12} {'encode':>10} {'total':>10} {'bytes':>12}")
+    print(f"{'legacy':10} {legacy_ms:10.1f}ms {legacy_encode_ms:8.1f}ms "
+          f"{legacy_ms + legacy_encode_ms:8.1f}ms {len(legacy_body):12,}")
+    print(f"{'compiled':10} {compiled_ms:10.1f}ms {compiled_encode_ms:8.1f}ms "
+          f"{compiled_ms + compiled_encode_ms:8.1f}ms {len(compiled_body):12,}")
+
+
+if __name__ == "__main__":
+    main()
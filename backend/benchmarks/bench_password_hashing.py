@@ -0,0 +1,69 @@
+"""Benchmark password hashing throughput for the configured cost parameters.
+
+Reports hashes/sec inline (one core) and through the PasswordService process
+pool, so PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS can be tuned per host.
+
+    python benchmarks/bench_password_hashing.py --method pbkdf2:sha256:260000 --workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from werkzeug.security import generate_password_hash
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SERVICE_PATH = BASE_DIR / "app" / "services" / "password_service.py"
+
+
+def load_password_service():
+    # Load the module by path: importing the `app` package would build the Flask app
+    spec = importlib.util.spec_from_file_location("password_service", SERVICE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_inline(method: str, count: int) -> float:
+    started = time.perf_counter()
+    for i in range(count):
+        generate_password_hash(f"password-{i}", method=method)
+    return count / (time.perf_counter() - started)
+
+
+def bench_pool(module, method: str, workers: int, count: int) -> float:
+    service = module.PasswordService(method=method, workers=workers, max_pending=count)
+    service.hash_password("warmup-pool")  # start the pool outside the timed section
+    started = time.perf_counter()
+    # Concurrent callers, like request threads during a login storm
+    with ThreadPoolExecutor(max_workers=max(workers * 2, 1)) as callers:
+        list(callers.map(service.hash_password, (f"password-{i}" for i in range(count))))
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--method", default=os.environ.get("PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000"))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("PASSWORD_HASH_WORKERS", 2)))
+    parser.add_argument("--count", type=int, default=20, help="hashes per measurement")
+    args = parser.parse_args()
+
+    module = load_password_service()
+    cores = os.cpu_count() or 1
+    print(f"Method: {args.method}  |  CPU cores: {cores}")
+
+    inline_rate = bench_inline(args.method, args.count)
+    print(f"Inline (1 core):           {inline_rate:8.2f} hashes/sec  ({1000 / inline_rate:.0f} ms/hash)")
+
+    if args.workers > 0:
+        pool_rate = bench_pool(module, args.method, args.workers, args.count)
+        per_core = pool_rate / min(args.workers, cores)
+        print(f"Pool ({args.workers} workers):          {pool_rate:8.2f} hashes/sec  ({per_core:.2f} hashes/sec per core)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+End-to-end check of the cross-worker invalidation bus (app/services/invalidation.py).
+
+Starts WORKERS separate processes, each with its own app, caches and
+invalidation listener (like gunicorn workers), and warms their taxonomy and
+session cache. This process then writes through the API and expects every
+worker to catch up from the published events alone, within TIMEOUT seconds:
+  - a new listing's make appears in each worker's taxonomy (applied
+    incrementally; the workers never re-read the catalog version themselves)
+  - deleting it removes the make again
+  - logging out evicts the session from each worker's session cache
+Exits non-zero if any worker misses an event.
+
+    python check_invalidation_bus.py       # uses DATABASE_URL / DATABASE_PATH like the app
+"""
+import multiprocessing
+import sys
+import time
+import uuid
+
+WORKERS = 3
+TIMEOUT = 10.0
+
+
+def worker(token, commands, results):
+    from app import app
+    from app.db import get_db
+    from app.routes.auth import get_user_from_token, _session_cache
+    from app.services.taxonomy import taxonomy
+
+    with app.test_request_context():
+        taxonomy.ensure_current(get_db())
+        get_user_from_token(token)
+    results.put(('ready', None))
+    for command, make in iter(commands.get, None):
+        results.put(('state', {
+            'has_make': make in taxonomy.makes(),
+            'session_cached': _session_cache.get(token) is not None,
+        }))
+
+
+def wait_for(channels, make, key, expected):
+    """Poll every worker until state[key] == expected; return the workers that never got there."""
+    deadline = time.monotonic() + TIMEOUT
+    pending = set(range(len(channels)))
+    while pending and time.monotonic() < deadline:
+        for index in list(pending):
+            commands, results = channels[index]
+            commands.put(('state', make))
+            _, state = results.get(timeout=TIMEOUT)
+            if state[key] == expected:
+                pending.discard(index)
+        time.sleep(0.2)
+    return sorted(pending)
+
+
+def main():
+    from app import app
+
+    client = app.test_client()
+    suffix = uuid.uuid4().hex[:8]
+    response = client.post('/api/auth/signup', json={
+        'username': f'bus_{suffix}', 'email': f'bus_{suffix}@example.com', 'password': 'Bus-check-1234',
+    })
+    token = (response.get_json() or {}).get('token')
+    if not token:
+        print(f"Signup failed: {response.get_json()}")
+        return 1
+    headers = {'Authorization': f'Bearer {token}'}
+
+    context = multiprocessing.get_context('spawn')
+    channels = [(context.Queue(), context.Queue()) for _ in range(WORKERS)]
+    processes = [context.Process(target=worker, args=(token, *channel), daemon=True) for channel in channels]
+    for process in processes:
+        process.start()
+    for _, results in channels:
+        results.get(timeout=60)
+
+    make = f'Buscheck{suffix}'
+    failures = 0
+
+    def check(name, key, expected):
+        nonlocal failures
+        missed = wait_for(channels, make, key, expected)
+        failures += bool(missed)
+        print(f"[{'FAIL' if missed else 'ok'}] {name}" + (f" (workers {missed} missed it)" if missed else ''))
+
+    try:
+        response = client.post('/api/cars', json={'make': make, 'model': 'Probe', 'year': 2020, 'price': 1000},
+                               headers=headers)
+        car_id = response.get_json()['id']
+        check('created listing reaches every taxonomy', 'has_make', True)
+
+        client.delete(f'/api/cars/{car_id}', headers=headers)
+        check('deleted listing leaves every taxonomy', 'has_make', False)
+
+        client.post('/api/auth/logout', headers=headers)
+        check('logout evicts the session everywhere', 'session_cached', False)
+    finally:
+        for commands, _ in channels:
+            commands.put(None)
+        for process in processes:
+            process.join(timeout=5)
+
+    print(f"\n{WORKERS} workers, {3 - failures}/3 invalidations delivered")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
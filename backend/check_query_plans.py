@@ -0,0 +1,93 @@
+"""
+Check that listing queries (GET /api/cars filters + sort) are served by an index.
+
+Builds the same SQL as the route (build_car_filters + order_clause) for a set
+of representative filter/sort combinations and inspects the query plan:
+  - SQLite: EXPLAIN QUERY PLAN must not contain a bare "SCAN cars" or a
+    "USE TEMP B-TREE FOR ORDER BY" (a sort that the index should provide).
+    Filter cases must SEARCH their expected index: "SCAN cars USING INDEX"
+    walks the whole index and only proves the sort is covered.
+  - PostgreSQL: EXPLAIN with enable_seqscan off must not contain a
+    "Seq Scan" on cars or a full "Sort" node (small tables otherwise always
+    seq-scan, which says nothing about index coverage), and filter cases must
+    scan their expected index.
+Cases marked unordered only need the index for their filters.
+Exits non-zero if any plan fails.
+
+    python check_query_plans.py            # uses DATABASE_URL / DATABASE_PATH like the app
+"""
+import sys
+
+from app import app
+from app.db import get_db, is_postgres
+from app.routes.cars import build_car_filters, order_clause
+
+# (name, query args[, index the filters must search[, ordered]])
+CASES = [
+    ('newest first', {}),
+    ('price ascending', {'sort': 'price-asc'}),
+    ('price descending', {'sort': 'price-desc'}),
+    ('year descending', {'sort': 'year-desc'}),
+    ('rating descending', {'sort': 'rating-desc'}),
+    ('price range', {'min_price': '10000', 'max_price': '30000', 'sort': 'price-asc'}, 'idx_cars_price_id'),
+    ('year range', {'min_year': '2018', 'max_year': '2022', 'sort': 'year-desc'}, 'idx_cars_year_id'),
+    ('make, newest', {'make': 'Toyota'}, 'idx_cars_make_created'),
+    ('make + price range, price asc', {'make': 'Toyota', 'min_price': '10000', 'max_price': '60000', 'sort': 'price-asc'},
+     'idx_cars_make_price'),
+    ('make, year descending', {'make': 'Toyota', 'sort': 'year-desc'}, 'idx_cars_make_year'),
+    ('city, newest', {'city': 'Amman'}, 'idx_cars_city_created'),
+    ('city + max price, price desc', {'city': 'Amman', 'max_price': '50000', 'sort': 'price-desc'}, 'idx_cars_city_price'),
+    # No index serves both these filters and the newest-first sort; they only have to be index range scans
+    ('max odometer', {'max_odometer': '50000'}, 'idx_cars_odometer', False),
+    ('SUVs over 300hp', {'body_style': 'suv', 'min_horsepower': '300'}, 'idx_cars_body_hp', False),
+    ('over 400hp', {'min_horsepower': '400'}, 'idx_cars_horsepower', False),
+]
+
+
+def listing_sql(args):
+    conditions, params = build_car_filters(args)
+    sql = f"SELECT id FROM cars WHERE 1=1{conditions} {order_clause(args.get('sort'))} LIMIT 20 OFFSET 0"
+    return sql, params
+
+
+def sqlite_problems(db, sql, params, index, ordered):
+    plan = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+    problems = [detail for detail in plan
+                if detail == 'SCAN cars' or (ordered and 'TEMP B-TREE FOR ORDER BY' in detail)]
+    if index and not any(detail.startswith('SEARCH cars USING ') and f"INDEX {index} " in detail for detail in plan):
+        problems.append(f"no SEARCH on {index}")
+    return plan, problems
+
+
+def postgres_problems(db, sql, params, index, ordered):
+    db.execute("SET enable_seqscan = off")
+    plan = [row[0] for row in db.execute(f"EXPLAIN {sql}", params).fetchall()]
+    problems = [line for line in plan
+                if 'Seq Scan on cars' in line or (ordered and line.strip().startswith('->  Sort '))]
+    if index and not any(f" {index} " in f"{line} " and 'Index' in line for line in plan):
+        problems.append(f"no index scan on {index}")
+    return plan, problems
+
+
+def main():
+    failures = 0
+    with app.app_context():
+        db = get_db()
+        explain = postgres_problems if is_postgres() else sqlite_problems
+        for name, args, *options in CASES:
+            index, ordered = (options + [None, True][len(options):])
+            plan, problems = explain(db, *listing_sql(args), index, ordered)
+            status = 'FAIL' if problems else 'ok'
+            failures += bool(problems)
+            print(f"[{status}] {name}")
+            for line in plan:
+                print(f"        {line}")
+            for problem in problems:
+                if problem not in plan:
+                    print(f"        -> {problem}")
+    print(f"\n{len(CASES) - failures}/{len(CASES)} listing queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Export the cars catalog to CSV, NDJSON or Parquet from the command line.
+
+Streams rows in batches (server-side cursor on PostgreSQL, fetchmany on SQLite),
+so memory stays flat for any catalog size. Uses DATABASE_URL / DATABASE_PATH
+like the app.
+
+    python export_catalog.py --format csv --output cars.csv --make Toyota
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.routes.cars import RANGE_FILTERS, SORT_ORDERS, build_car_filters, order_clause
+from app.services.catalog_export import EXPORT_FORMATS, available_formats, write_export
+from app.db import get_db
+
+# Filter arguments of GET /api/cars, as --make, --min_price, ...
+FILTERS = ("make", "category", "condition", "transmission", "fuelType", "city", "body_style", "search") + tuple(
+    key for key, *_ in RANGE_FILTERS
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--output", help="output file (default: cars.<format extension>)")
+    # Same filters and sort orders as GET /api/cars (default order: id)
+    for name in FILTERS:
+        parser.add_argument(f"--{name}")
+    parser.add_argument("--sort", choices=list(SORT_ORDERS))
+    args = parser.parse_args()
+
+    if args.format not in available_formats():
+        parser.error(f"{args.format} export needs pyarrow installed")
+
+    output = args.output or f"cars.{EXPORT_FORMATS[args.format][1]}"
+    filters = {name: getattr(args, name) for name in FILTERS}
+
+    app = create_app(background_tasks=False)
+    with app.app_context():
+        where_sql, params = build_car_filters(filters)
+        order = order_clause(args.sort) if args.sort else None
+        started = time.perf_counter()
+        count = write_export(get_db(), output, args.format, where_sql, params, order=order)
+
+    print(f"Exported {count} cars to {output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ import re
 import json
 from pathlib import Path
 
+from app.catalog import bump_after_import
+from app.services.text_normalization import refresh_search_text_after_import
+
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "intelliwheels.db"
 SQL_DUMP_PATH = BASE_DIR / "data" / "Middle-East-GCC-Car-Database-by-Teoalida-SAMPLE.sql"
@@ -244,6 +247,9 @@ def main():
         ))
     
     conn.commit()
+    refresh_search_text_after_import(conn)
+    # Cars and dealers were recreated above
+    bump_after_import(conn)
     conn.close()
     
     print(f"✅ Inserted {len(cars)} cars into {DB_PATH}")
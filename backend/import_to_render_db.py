@@ -13,6 +13,9 @@ except ImportError:
 
 from pathlib import Path
 
+from app.catalog import bump_after_import, CARS, DEALERS
+from app.services.text_normalization import refresh_search_text_after_import
+
 BASE_DIR = Path(__file__).resolve().parent
 SQL_DUMP_PATH = BASE_DIR / "data" / "Middle-East-GCC-Car-Database-by-Teoalida-SAMPLE.sql"
 
@@ -165,6 +168,8 @@ def import_to_postgres(database_url: str, cars: list):
         ))
     
     conn.commit()
+    refresh_search_text_after_import(conn)
+    bump_after_import(conn, CARS)
     
     # Verify
     cursor.execute("SELECT COUNT(*) FROM cars")
@@ -308,6 +313,7 @@ def import_dealers_to_postgres(database_url: str):
         ))
     
     conn.commit()
+    bump_after_import(conn, DEALERS)
     print(f"✅ Imported {len(dealers)} sample dealers!")
     conn.close()
 
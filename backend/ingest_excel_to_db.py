@@ -8,6 +8,9 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+from app.catalog import bump_after_import, CARS
+from app.services.text_normalization import refresh_search_text_after_import
+
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "intelliwheels.db"
 SQL_DUMP_PATH = BASE_DIR / "data" / "Middle-East-GCC-Car-Database-by-Teoalida-SAMPLE.sql"
@@ -403,6 +406,8 @@ def insert_groups(groups: Dict[Tuple[str, str, int], CarGroup]) -> int:
         inserted += 1
 
     conn.commit()
+    refresh_search_text_after_import(conn)
+    bump_after_import(conn, CARS)
     conn.close()
     return inserted
 
@@ -13,7 +13,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 
-app = create_app()
+
+def __getattr__(name):
+    # 'gunicorn run:app' builds the app on first access. Not at import: process
+    # pool children (password hashing) re-run this script as __mp_main__.
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=True)
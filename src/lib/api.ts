@@ -95,6 +95,15 @@ async function apiRequest<T = any>(path: string, options: RequestOptions<T> = {}
   return data as T;
 }
 
+function appendRangeFilters(params: URLSearchParams, filters: CarFilters) {
+  if (filters.minPrice != null) params.append('min_price', String(filters.minPrice));
+  if (filters.maxPrice != null) params.append('max_price', String(filters.maxPrice));
+  if (filters.minYear != null) params.append('min_year', String(filters.minYear));
+  if (filters.maxYear != null) params.append('max_year', String(filters.maxYear));
+  if (filters.maxOdometer != null) params.append('max_odometer', String(filters.maxOdometer));
+  if (filters.city && filters.city !== 'all') params.append('city', filters.city);
+}
+
 export async function fetchCars(filters: CarFilters, signal?: AbortSignal, token?: string | null) {
   const params = new URLSearchParams();
   if (filters.make && filters.make !== 'all') params.append('make', filters.make);
@@ -104,11 +113,42 @@ export async function fetchCars(filters: CarFilters, signal?: AbortSignal, token
   if (filters.condition) params.append('condition', filters.condition);
   if (filters.transmission) params.append('transmission', filters.transmission);
   if (filters.fuelType) params.append('fuelType', filters.fuelType);
+  appendRangeFilters(params, filters);
 
   // No fallback - frontend depends on backend API for real car data only
-  return apiRequest<{ success: boolean; cars: Car[] }>(`/cars${params.size ? `?${params.toString()}` : ''}`, {
+  // total is null with count=none; totalExact is false when it is a planner estimate
+  return apiRequest<{ success: boolean; cars: Car[]; total: number | null; totalExact: boolean }>(
+    `/cars${params.size ? `?${params.toString()}` : ''}`,
+    {
+      signal,
+      token,
+    }
+  );
+}
+
+export interface FacetBucket {
+  value?: string;
+  min?: number;
+  max?: number | null;
+  count: number;
+}
+
+export type CarFacets = Partial<
+  Record<'make' | 'category' | 'condition' | 'transmission' | 'fuelType' | 'city' | 'price', FacetBucket[]>
+>;
+
+export async function fetchCarFacets(filters: CarFilters, signal?: AbortSignal) {
+  // Sidebar counts for the current filters; each facet ignores its own filter
+  const params = new URLSearchParams({ limit: '0', facets: '1' });
+  if (filters.make && filters.make !== 'all') params.append('make', filters.make);
+  if (filters.search) params.append('search', filters.search);
+  if (filters.category && filters.category !== 'all') params.append('category', filters.category);
+  if (filters.condition) params.append('condition', filters.condition);
+  if (filters.transmission) params.append('transmission', filters.transmission);
+  if (filters.fuelType) params.append('fuelType', filters.fuelType);
+  appendRangeFilters(params, filters);
+  return apiRequest<{ success: boolean; total: number; facets: CarFacets }>(`/cars?${params.toString()}`, {
     signal,
-    token,
   });
 }
 
@@ -119,6 +159,34 @@ export async function fetchCarById(carId: number, token?: string | null) {
   });
 }
 
+export async function fetchCarsByIds(carIds: number[], token?: string | null, fields?: string) {
+  // One request for many cars (max 100); cars come back in the requested order
+  const params = new URLSearchParams({ ids: carIds.join(',') });
+  if (fields) params.append('fields', fields);
+  return apiRequest<{ success: boolean; cars: Car[]; missing: number[] }>(`/cars/batch?${params.toString()}`, {
+    token,
+  });
+}
+
+export interface BatchSubResponse<T = unknown> {
+  id: string | null;
+  path: string;
+  status: number;
+  body: T;
+}
+
+export async function batchGet(
+  requests: Array<{ id?: string; path: string }>,
+  token?: string | null,
+) {
+  // Up to 10 GET calls in one round trip; paths are full API paths, e.g. '/api/makes'
+  return apiRequest<{ success: boolean; responses: BatchSubResponse[] }>(`/batch`, {
+    method: 'POST',
+    body: { requests },
+    token,
+  });
+}
+
 export async function fetchMakes(token?: string | null) {
   // No fallback - frontend depends on backend API for real makes data only
   return apiRequest<{ success: boolean; makes: string[] }>(`/makes`, {
@@ -141,6 +209,24 @@ export async function fetchEngines(make: string, model: string, token?: string |
   );
 }
 
+export interface AutocompleteSuggestion {
+  type: 'make' | 'model' | 'trim';
+  label: string;
+  make: string;
+  model?: string;
+  trim?: string;
+  count: number;
+}
+
+export async function fetchAutocomplete(query: string, limit = 8, signal?: AbortSignal) {
+  // Typo-tolerant make/model/trim suggestions; accepts English or Arabic input
+  const params = new URLSearchParams({ q: query, limit: String(limit) });
+  return apiRequest<{ success: boolean; suggestions: AutocompleteSuggestion[] }>(
+    `/autocomplete?${params.toString()}`,
+    { signal }
+  );
+}
+
 // REMOVED: filterLocalCars, getLocalCarById, getLocalMakes functions
 // No synthetic data fallbacks - frontend relies on backend API only
 
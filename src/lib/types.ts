@@ -18,6 +18,13 @@ export interface CarFilters {
   condition?: VehicleCondition;
   transmission?: TransmissionType;
   fuelType?: FuelType;
+  // Server-side range filters (GET /api/cars)
+  minPrice?: number;
+  maxPrice?: number;
+  minYear?: number;
+  maxYear?: number;
+  maxOdometer?: number;
+  city?: string;
 }
 
 export interface CarSpecs {